@@ -5,14 +5,20 @@ import logging
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import aiohttp_client
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE, Platform
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
 from homeassistant.helpers.typing import ConfigType
-from custom_components.tech.tech_update_coordinator import TechUpdateCoordinator
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from custom_components.tech.tech_account_hub import TechAccountHub, account_key
+from custom_components.tech.tech_update_coordinator import (
+    TechUpdateCoordinator,
+    snapshot_store,
+)
 
-from .const import DOMAIN
-from .tech import Tech
+from .const import ACCOUNT_HUBS, DISCOVERED_CLIENTS, DOMAIN
+from .services import async_setup_services, async_stop_recording_api
+from .tech import Tech, redact
 
 _LOGGER = logging.getLogger(__name__)
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
@@ -24,6 +30,20 @@ PLATFORMS = [Platform.CLIMATE, Platform.SELECT]
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Tech Controllers component."""
     hass.data.setdefault(DOMAIN, {})
+
+    async def _async_close_sessions(event: Event) -> None:
+        """Close the cassettes and HTTP sessions of all accounts.
+
+        Entries are not unloaded on shutdown, so recordings are finished here.
+        """
+        for hub in hass.data[DOMAIN].get(ACCOUNT_HUBS, {}).values():
+            await async_stop_recording_api(hass, hub.api)
+            await hub.api.close()
+        for api in hass.data[DOMAIN].pop(DISCOVERED_CLIENTS, {}).values():
+            await api.close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_sessions)
+    async_setup_services(hass)
     return True
 
 
@@ -34,26 +54,39 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.debug(
         "Entry -> title: %s, data: %s, id: %s, domain: %s",
         entry.title,
-        entry.data,
+        redact(dict(entry.data)),
         entry.entry_id,
         entry.domain
     )
 
     # Store an API object for your platforms to access
     hass.data.setdefault(DOMAIN, {})
-    http_session = aiohttp_client.async_get_clientsession(hass)   
-    api = Tech(
-        http_session,
-        entry.data["user_id"],
-        entry.data["token"]
-    )
+    hub = _async_get_account_hub(hass, entry)
+    api = hub.api
 
     coordinator = TechUpdateCoordinator(hass, entry, api, entry.data["module"]["udid"])
-    await coordinator._async_update_data()
+    if await coordinator.async_restore():
+        # Entities start from the stored snapshot, the cloud catches up later.
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"Tech module refresh {coordinator.udid}"
+        )
+    else:
+        try:
+            await coordinator.async_first_update()
+        except (ConfigEntryAuthFailed, UpdateFailed) as err:
+            if not hub.coordinators:
+                # No other module of the account set up, release its connection pool.
+                hass.data[DOMAIN][ACCOUNT_HUBS].pop(hub.key, None)
+                await hub.api.close()
+            if isinstance(err, UpdateFailed):
+                raise ConfigEntryNotReady(str(err)) from err
+            raise
+    hub.async_add_coordinator(coordinator)
 
     hass.data[DOMAIN][entry.entry_id] = {
         "api": api,
-        "coordinator": coordinator
+        "coordinator": coordinator,
+        "hub": hub
     }
 
     # Use async_forward_entry_setups instead of async_forward_entry_setup
@@ -67,6 +100,59 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        # Send writes still waiting in the debounce window.
+        await entry_data["coordinator"].write_queue.flush()
+        await entry_data["coordinator"].async_shutdown()
+        hub: TechAccountHub = entry_data["hub"]
+        if hub.async_remove_coordinator(entry_data["coordinator"].udid):
+            hass.data[DOMAIN][ACCOUNT_HUBS].pop(hub.key, None)
+            # Last module of the account, release its connection pool.
+            await async_stop_recording_api(hass, hub.api)
+            await hub.api.close()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored snapshot of a deleted entry."""
+    await snapshot_store(hass, entry.data["module"]["udid"]).async_remove()
+
+
+def _async_get_account_hub(hass: HomeAssistant, entry: ConfigEntry) -> TechAccountHub:
+    """Return the hub shared by all modules of the entry's account."""
+    hubs: dict[str, TechAccountHub] = hass.data[DOMAIN].setdefault(ACCOUNT_HUBS, {})
+    key = account_key(entry.data["user_id"], entry.data["token"])
+    hub = hubs.get(key)
+    if hub is None:
+        # Entries just created by the config flow reuse its client.
+        api = hass.data[DOMAIN].get(DISCOVERED_CLIENTS, {}).pop(key, None)
+        if api is None:
+            # Each account owns a connection pool to emodul.eu instead of
+            # competing with other integrations on the shared session.
+            api = Tech(
+                None,
+                entry.data["user_id"],
+                entry.data["token"],
+                username=entry.data.get("username"),
+                password=entry.data.get("password"),
+                base_url=entry.data.get("base_url", Tech.TECH_API_URL)
+            )
+        api.add_token_listener(
+            lambda user_id, token: _async_token_renewed(hass, user_id, token)
+        )
+        hub = hubs[key] = TechAccountHub(hass, api)
+    return hub
+
+
+@callback
+def _async_token_renewed(hass: HomeAssistant, user_id: str, token: str) -> None:
+    """Store a renewed token in all entries of the account."""
+    hubs: dict[str, TechAccountHub] = hass.data[DOMAIN][ACCOUNT_HUBS]
+    rekeyed = {hub.key: hub for hub in hubs.values()}
+    hubs.clear()
+    hubs.update(rekeyed)
+
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry.data["user_id"] == user_id and entry.data["token"] != token:
+            hass.config_entries.async_update_entry(entry, data={**entry.data, "token": token})
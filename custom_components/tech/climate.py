@@ -17,13 +17,13 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import (HomeAssistant, callback)
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import DOMAIN
+from .entity import TechEntity
+from .models import TechZone
 from .tech import Tech
 
 _LOGGER = logging.getLogger(__name__)
@@ -55,7 +55,7 @@ async def async_setup_entry(
     
 
 
-class TechThermostat(CoordinatorEntity, ClimateEntity):
+class TechThermostat(TechEntity, ClimateEntity):
     """Representation of a Tech climate."""
 
     _attr_temperature_unit = UnitOfTemperature.CELSIUS
@@ -63,18 +63,18 @@ class TechThermostat(CoordinatorEntity, ClimateEntity):
     _attr_supported_features = ClimateEntityFeature.TARGET_TEMPERATURE | ClimateEntityFeature.PRESET_MODE
     _attr_preset_modes = DEFAULT_PRESETS
 
-    def __init__(self, device: dict[str, Any], coordinator, api: Tech) -> None:
+    def __init__(self, device: TechZone, coordinator, api: Tech) -> None:
         """Initialize the Tech device."""
         self._api = api
-        self._id: int = device["zone"]["id"]
-        self._zone_mode_id = device["mode"]["id"]
+        self._id: int = device.id
+        self._zone_mode_id = device.mode_id
         self._udid = coordinator.udid
         
         # Set unique_id first as it's required for entity registry
         self._attr_unique_id = f"{self._udid}_{self._id}"
         self._attr_device_info = {
             "identifiers": {(DOMAIN, self._attr_unique_id)},
-            "name": device["description"]["name"],
+            "name": device.name,
             "manufacturer": "Tech",
         }
 
@@ -91,21 +91,20 @@ class TechThermostat(CoordinatorEntity, ClimateEntity):
         
         self.update_properties(coordinator.get_zones()[self._id])
 
-    def update_properties(self, device: dict[str, Any]) -> None:
+    def update_properties(self, device: TechZone) -> None:
         """Update the properties from device data."""
-        self._attr_name = device["description"]["name"]
+        self._attr_name = device.name
         
-        zone = device["zone"]
-        if zone["setTemperature"] is not None:
-            self._attr_target_temperature = zone["setTemperature"] / 10
+        if device.target_temperature is not None:
+            self._attr_target_temperature = device.target_temperature
         
-        if zone["currentTemperature"] is not None:
-            self._attr_current_temperature = zone["currentTemperature"] / 10
+        if device.current_temperature is not None:
+            self._attr_current_temperature = device.current_temperature
             
-        if zone["humidity"] is not None:
-            self._attr_current_humidity = zone["humidity"]
+        if device.humidity is not None:
+            self._attr_current_humidity = device.humidity
             
-        state = zone["flags"]["relayState"]
+        state = device.relay_state
         if state == "on":
             self._attr_hvac_action = HVACAction.HEATING
         elif state == "off":
@@ -113,24 +112,29 @@ class TechThermostat(CoordinatorEntity, ClimateEntity):
         else:
             self._attr_hvac_action = HVACAction.OFF        
         
-        mode = zone["zoneState"]
+        mode = device.zone_state
         self._attr_hvac_mode = HVACMode.HEAT if mode in ["zoneOn", "noAlarm"] else HVACMode.OFF
     
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""        
+        if not self._has_coordinator_changes():
+            return
+
         _LOGGER.debug("Coordinator update for zone %s", self._attr_name)
         self.update_properties(self.coordinator.get_zones()[self._id])
+        self._reconcile_optimistic()
         self.async_write_ha_state()
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Set new target temperature."""
         temperature = kwargs.get(ATTR_TEMPERATURE)
         if temperature is not None:
+            previous = self._async_apply_optimistic("_attr_target_temperature", temperature)
             try:
-                await self._api.set_const_temp(self._udid, self._zone_mode_id, self._id, temperature)
-                await self.coordinator.async_request_refresh()
+                await self.coordinator.async_set_zone_temperature(self._zone_mode_id, self._id, temperature)
             except Exception as ex:
+                self._async_rollback_optimistic("_attr_target_temperature", previous)
                 _LOGGER.error(
                     "Failed to set temperature for %s to %s: %s",
                     self._attr_name,
@@ -145,17 +149,22 @@ class TechThermostat(CoordinatorEntity, ClimateEntity):
                 return
             
             preset_mode_id = DEFAULT_PRESETS.index(preset_mode)
-            await self._api.set_module_menu(
-                self._udid,
-                "mu",
-                1000,
-                preset_mode_id
-            )
-
+            previous = (self._attr_preset_modes, self._attr_preset_mode)
             self._attr_preset_modes = [CHANGE_PRESET]
             self._attr_preset_mode = CHANGE_PRESET
+            if self.coordinator.optimistic:
+                self.async_write_ha_state()
 
-            await self.coordinator.async_request_refresh()
+            try:
+                await self.coordinator.async_set_menu(
+                    "mu",
+                    1000,
+                    preset_mode_id
+                )
+            except Exception:
+                self._attr_preset_modes, self._attr_preset_mode = previous
+                self.async_write_ha_state()
+                raise
         except Exception as ex:
             _LOGGER.error(
                 "Failed to set preset mode for %s to %s: %s",
@@ -166,14 +175,14 @@ class TechThermostat(CoordinatorEntity, ClimateEntity):
 
     async def async_set_hvac_mode(self, hvac_mode: str) -> None:
         """Set new target hvac mode."""
+        previous = self._async_apply_optimistic("_attr_hvac_mode", hvac_mode)
         try:
-            await self._api.set_zone(
-                self._udid,
+            await self.coordinator.async_set_zone_state(
                 self._id,
                 hvac_mode == HVACMode.HEAT
             )
-            await self.coordinator.async_request_refresh()
         except Exception as ex:
+            self._async_rollback_optimistic("_attr_hvac_mode", previous)
             _LOGGER.error(
                 "Failed to set hvac mode for %s to %s: %s",
                 self._attr_name,
@@ -1,29 +1,48 @@
 """Config flow for Tech Sterowniki integration."""
-import logging, uuid
+import asyncio, logging, uuid
 import voluptuous as vol
-from homeassistant import config_entries, core, exceptions
+from homeassistant import config_entries, core, data_entry_flow, exceptions
 from homeassistant.helpers import aiohttp_client
 from homeassistant.config_entries import ConfigEntry
-from .const import DOMAIN  # pylint:disable=unused-import
-from .tech import Tech
+from .const import DISCOVERED_CLIENTS, DOMAIN  # pylint:disable=unused-import
+from .tech import Tech, TechError
+from .tech_account_hub import account_key
 from types import MappingProxyType
+from urllib.parse import urlsplit
 
 _LOGGER = logging.getLogger(__name__)
 
-DATA_SCHEMA = vol.Schema({
-    vol.Required("username"): str,
-    vol.Required("password"): str,
-})
+def data_schema(base_url: str = Tech.TECH_API_URL) -> vol.Schema:
+    """Return the credentials schema with base_url defaulting to the given API root."""
+    return vol.Schema({
+        vol.Required("username"): str,
+        vol.Required("password"): str,
+        # A TechProxy lets several Home Assistant instances share one cloud poll.
+        vol.Optional("base_url", default=base_url): str,
+    })
 
 
-async def validate_input(hass: core.HomeAssistant, data):
+DATA_SCHEMA = data_schema()
+
+
+def normalize_base_url(base_url: str) -> str:
+    """Return the API root with a trailing slash, raise InvalidBaseUrl if it is not an http(s) URL."""
+    base_url = base_url.strip()
+    parts = urlsplit(base_url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise InvalidBaseUrl
+    return base_url if base_url.endswith("/") else base_url + "/"
+
+
+async def validate_input(hass: core.HomeAssistant, data, api: Tech = None):
     """Validate the user input allows us to connect.
 
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
 
-    http_session = aiohttp_client.async_get_clientsession(hass)
-    api = Tech(http_session)
+    base_url = normalize_base_url(data["base_url"])
+    if api is None:
+        api = Tech(aiohttp_client.async_get_clientsession(hass), base_url=base_url)
 
     if not await api.authenticate(data["username"], data["password"]):
         raise InvalidAuth
@@ -35,7 +54,38 @@ async def validate_input(hass: core.HomeAssistant, data):
     # InvalidAuth
 
     # Return info that you want to store in the config entry.
-    return { "user_id": api.user_id, "token": api.token, "modules": modules }
+    return {
+        "user_id": api.user_id,
+        "token": api.token,
+        "username": data["username"],
+        "password": data["password"],
+        "base_url": base_url,
+        "modules": modules
+    }
+
+
+async def probe_modules(api: Tech, modules: list) -> list:
+    """Fetch zones and menu of all modules concurrently, return the reachable ones.
+
+    The responses stay in the client cache, so the first update of the new
+    entries does not fetch them again.
+    """
+    results = await asyncio.gather(
+        *(
+            asyncio.gather(api.get_module_zones(module["udid"]), api.get_module_menu(module["udid"], "mu"))
+            for module in modules
+        ),
+        return_exceptions=True,
+    )
+    reachable = []
+    for module, result in zip(modules, results):
+        if isinstance(result, TechError):
+            _LOGGER.warning("Skipping unreachable Tech module %s: %s", module["udid"], result)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            reachable.append(module)
+    return reachable
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -49,20 +99,47 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle the initial step."""
         errors = {}
         if user_input is not None:
+            # Owned by the new entries once handed over, closed otherwise.
+            api = None
+            handed_over = False
             try:
-                _LOGGER.debug("Context: " + str(self.context))                
-                validated_input = await validate_input(self.hass, user_input)
-
-                modules = self._create_modules_array(validated_input=validated_input)
-
-                if len(modules) == 0:
-                    return self.async_abort("no_modules")
-
-                if len(modules) > 1:
-                    for module in modules[1:len(modules)]:
-                        await self.hass.config_entries.async_add(self._create_config_entry(module=module))
-                    
+                _LOGGER.debug("Context: %s", self.context)                
+                api = Tech(base_url=normalize_base_url(user_input["base_url"]))
+                validated_input = await validate_input(self.hass, user_input, api)
+
+                if len(validated_input["modules"]) == 0:
+                    return self.async_abort(reason="no_modules")
+
+                configured = self._configured_udids()
+                discovered = [
+                    module for module in validated_input["modules"]
+                    if module["udid"] not in configured
+                ]
+                if len(discovered) == 0:
+                    return self.async_abort(reason="already_configured")
+
+                reachable = await probe_modules(api, discovered)
+                if len(reachable) == 0:
+                    return self.async_abort(reason="no_modules")
+
+                modules = self._create_modules_array(validated_input={**validated_input, "modules": reachable})
+                # Aborts if a flow for the same module is already in progress.
+                await self.async_set_unique_id(modules[0]["module"]["udid"])
+
+                # New entries take over the authenticated client and its cached module data.
+                clients = self.hass.data.setdefault(DOMAIN, {}).setdefault(DISCOVERED_CLIENTS, {})
+                clients[account_key(api.user_id, api.token)] = api
+                handed_over = True
+
+                await asyncio.gather(*(
+                    self.hass.config_entries.async_add(self._create_config_entry(module=module))
+                    for module in modules[1:]
+                ))
                 return self.async_create_entry(title=modules[0]["version"], data=modules[0])
+            except data_entry_flow.AbortFlow:
+                raise
+            except InvalidBaseUrl:
+                errors["base_url"] = "invalid_base_url"
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except InvalidAuth:
@@ -70,20 +147,63 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
+            finally:
+                if api is not None and not handed_over:
+                    await api.close()
 
         return self.async_show_form(
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
     
-    async def async_step_reauth(self, user_input=None):
+    async def async_step_reauth(self, entry_data):
         """Handle reauth step."""
-        if user_input is None:
-            return self.async_show_form(
-                step_id="reauth_confirm",
-                data_schema=DATA_SCHEMA,
-            )
-        
-        return await self.async_step_user()
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(self, user_input=None):
+        """Ask for new credentials and store them in all entries of the account."""
+        errors = {}
+        reauth_entry = self.hass.config_entries.async_get_entry(self.context["entry_id"])
+        if user_input is not None:
+            try:
+                validated_input = await validate_input(self.hass, user_input)
+                if str(validated_input["user_id"]) != str(reauth_entry.data["user_id"]):
+                    # Credentials of another account would move the modules to it.
+                    return self.async_abort(reason="wrong_account")
+                for entry in self.hass.config_entries.async_entries(DOMAIN):
+                    if entry.data["user_id"] != reauth_entry.data["user_id"]:
+                        continue
+                    self.hass.config_entries.async_update_entry(entry, data={
+                        **entry.data,
+                        "user_id": validated_input["user_id"],
+                        "token": validated_input["token"],
+                        "username": validated_input["username"],
+                        "password": validated_input["password"],
+                        "base_url": validated_input["base_url"]
+                    })
+                    self.hass.async_create_task(self.hass.config_entries.async_reload(entry.entry_id))
+                return self.async_abort(reason="reauth_successful")
+            except InvalidBaseUrl:
+                errors["base_url"] = "invalid_base_url"
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected exception")
+                errors["base"] = "unknown"
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            # Keep the account on the API root it uses, a proxy or the cloud.
+            data_schema=data_schema(reauth_entry.data.get("base_url", Tech.TECH_API_URL)),
+            errors=errors
+        )
+
+    def _configured_udids(self) -> set:
+        return {
+            entry.data["module"]["udid"]
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+        }
 
     def _create_config_entry(self, module: dict) -> ConfigEntry:
         return ConfigEntry(
@@ -96,7 +216,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             minor_version=ConfigFlow.MINOR_VERSION,
             source=ConfigFlow.CONNECTION_CLASS,
 	        options={},
-            unique_id=None,
+            unique_id=module["module"]["udid"],
 	        subentries_data=[])
     
     def _create_modules_array(self, validated_input: dict) -> [dict]:
@@ -109,6 +229,9 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return {   
             "user_id": validated_input["user_id"],
             "token": validated_input["token"],
+            "username": validated_input["username"],
+            "password": validated_input["password"],
+            "base_url": validated_input["base_url"],
             "module": module_dict,
             "version": module_dict["version"] + ": " + module_dict["name"]
         }
@@ -120,3 +243,7 @@ class CannotConnect(exceptions.HomeAssistantError):
 
 class InvalidAuth(exceptions.HomeAssistantError):
     """Error to indicate there is invalid auth."""
+
+
+class InvalidBaseUrl(exceptions.HomeAssistantError):
+    """Error to indicate the API URL is not an http(s) URL."""
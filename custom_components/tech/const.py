@@ -1,3 +1,48 @@
 """Constants for the Tech Sterowniki integration."""
 
 DOMAIN = "tech"
+
+# Key under hass.data[DOMAIN] holding the account hubs, indexed by account key.
+ACCOUNT_HUBS = "account_hubs"
+
+# Key under hass.data[DOMAIN] holding clients authenticated by the config flow,
+# indexed by account key, until the account hub of the new entries takes them.
+DISCOVERED_CLIENTS = "discovered_clients"
+
+# Base polling interval shared by all modules of one eModul account.
+DEFAULT_UPDATE_INTERVAL = 32
+
+# Bounds of the adaptive polling interval, in seconds. Polls speed up to the
+# minimum while changes are pending and relax to the maximum while idle.
+DEFAULT_MIN_UPDATE_INTERVAL = 8
+DEFAULT_MAX_UPDATE_INTERVAL = 120
+
+# Writes queued within this many seconds are sent as one batch.
+DEFAULT_WRITE_DELAY = 1.0
+
+# Entities show written values before the cloud confirms them.
+DEFAULT_OPTIMISTIC = True
+
+# Seconds after a write batch before the confirming refresh.
+CONFIRM_DELAY = 5
+
+# Seconds an unconfirmed optimistic value is kept before reverting.
+OPTIMISTIC_TIMEOUT = 60
+
+# Seconds between fetches of each module menu type. Menus rarely change, so
+# they are polled far less often than zones, and at once while a change is
+# pending. Types other than "mu" are only polled once a value of them is written.
+MENU_REFRESH_INTERVALS = {"mu": 300, "mi": 3600, "ms": 3600, "mp": 3600}
+
+# Seconds entities keep their last good data while the cloud is unreachable.
+STALE_DATA_TIMEOUT = 1800
+
+# Service writing the temperature or state of many zones at once.
+SERVICE_SET_ZONES = "set_zones"
+
+# Services recording the API traffic of all accounts to cassette files.
+SERVICE_START_RECORDING = "start_recording"
+SERVICE_STOP_RECORDING = "stop_recording"
+
+# Zone writes of one set_zones call sent concurrently.
+MAX_CONCURRENT_GROUP_WRITES = 4
@@ -0,0 +1,49 @@
+"""Diagnostics support for Tech Controllers."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .tech import Tech
+from .tech_account_hub import TechAccountHub
+from .tech_update_coordinator import TechUpdateCoordinator
+
+TO_REDACT = {"token", "user_id", "username", "password", "email", "phoneNumber", "zipCode"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    api: Tech = entry_data["api"]
+    coordinator: TechUpdateCoordinator = entry_data["coordinator"]
+    hub: TechAccountHub = entry_data["hub"]
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "module": {
+            "udid": coordinator.udid,
+            "last_update_success": coordinator.last_update_success,
+            "restored": coordinator.restored,
+            "menu_stale": coordinator.is_menu_stale() if coordinator.data else None,
+            "menu_types": sorted(coordinator.menu_types),
+            "zones": len(coordinator.get_zones()) if coordinator.data else 0,
+            "queued_writes": coordinator.write_queue.queued_writes,
+            "sent_writes": coordinator.write_queue.sent_writes,
+        },
+        "polling": {
+            "modules": len(hub.coordinators),
+            "interval": hub.scheduler.interval,
+            "min_interval": hub.scheduler.min_interval,
+            "max_interval": hub.scheduler.max_interval,
+            "phase": hub.phases.get(coordinator.udid),
+            "rate_profile": hub.rate_profile(),
+        },
+        # Request metrics are shared by all modules of the account.
+        "api": api.stats(),
+    }
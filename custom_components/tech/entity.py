@@ -0,0 +1,73 @@
+"""Base entity for Tech Controllers."""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import OPTIMISTIC_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TechEntity(CoordinatorEntity):
+    """Coordinator entity supporting optimistic state updates.
+
+    A write applies its value locally and writes HA state right away. The
+    value is held against coordinator updates until the coordinator reports
+    it, or until OPTIMISTIC_TIMEOUT seconds pass and coordinator data wins.
+    """
+
+    def __init__(self, coordinator, context: Any = None) -> None:
+        """Initialize the Tech entity."""
+        super().__init__(coordinator, context=context)
+        self._optimistic: dict[str, tuple[tuple, float]] = {}
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Flag state restored from the stored snapshot."""
+        if self.coordinator.restored:
+            return {"restored": True}
+        return None
+
+    def _has_coordinator_changes(self) -> bool:
+        """Return True if the last coordinator update concerns this entity."""
+        return bool(self._optimistic) or self.coordinator.context_changed(self.coordinator_context)
+
+    def _async_apply_optimistic(self, attr: str, value: Any, *accepted: Any) -> Any:
+        """Set attribute locally if the coordinator is optimistic.
+
+        Coordinator values equal to value or any of accepted confirm the
+        write. Returns the previous value to roll back to on failure.
+        """
+        previous = getattr(self, attr)
+        if self.coordinator.optimistic:
+            setattr(self, attr, value)
+            self._optimistic[attr] = ((value, *accepted), time.monotonic() + OPTIMISTIC_TIMEOUT)
+            self.async_write_ha_state()
+        return previous
+
+    def _async_rollback_optimistic(self, attr: str, previous: Any) -> None:
+        """Restore the attribute after a failed write."""
+        if self._optimistic.pop(attr, None) is not None:
+            setattr(self, attr, previous)
+            self.async_write_ha_state()
+
+    def _reconcile_optimistic(self) -> None:
+        """Re-apply optimistic values the coordinator has not confirmed yet."""
+        now = time.monotonic()
+        for attr, (accepted, expires_at) in list(self._optimistic.items()):
+            if getattr(self, attr) in accepted:
+                del self._optimistic[attr]
+            elif now < expires_at:
+                setattr(self, attr, accepted[0])
+            else:
+                _LOGGER.warning(
+                    "Write of %s to %s was not confirmed for %s, reverting",
+                    attr,
+                    accepted[0],
+                    self.name
+                )
+                del self._optimistic[attr]
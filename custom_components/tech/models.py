@@ -0,0 +1,89 @@
+"""Compact records parsed from Tech API responses."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass(slots=True, frozen=True)
+class TechZone:
+    """State of one zone, temperatures already scaled to degrees."""
+
+    id: int
+    mode_id: int
+    name: str
+    target_temperature: float | None
+    current_temperature: float | None
+    humidity: int | None
+    relay_state: str | None
+    zone_state: str
+
+    @classmethod
+    def from_api(cls, element: dict[str, Any]) -> TechZone:
+        """Parse a zone element of the module zones list."""
+        zone = element["zone"]
+        set_temperature = zone["setTemperature"]
+        current_temperature = zone["currentTemperature"]
+        return cls(
+            id=zone["id"],
+            mode_id=element["mode"]["id"],
+            name=element["description"]["name"],
+            target_temperature=set_temperature / 10 if set_temperature is not None else None,
+            current_temperature=current_temperature / 10 if current_temperature is not None else None,
+            humidity=zone["humidity"],
+            relay_state=zone["flags"]["relayState"],
+            zone_state=zone["zoneState"],
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class TechMenuElement:
+    """Value of one module menu option."""
+
+    id: int
+    value: Any
+    during_change: bool
+
+    @classmethod
+    def from_api(cls, element: dict[str, Any]) -> TechMenuElement:
+        """Parse an element of the module menu."""
+        return cls(
+            id=element["id"],
+            value=element.get("params", {}).get("value"),
+            during_change=element.get("duringChange") == "t",
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class TechMenu:
+    """Module menu with its elements indexed by element id."""
+
+    elements: dict[int, TechMenuElement]
+
+    @classmethod
+    def from_api(cls, menu: dict[str, Any]) -> TechMenu:
+        """Parse the data section of a module menu response."""
+        return cls(
+            elements={
+                element["id"]: TechMenuElement.from_api(element)
+                for element in menu["elements"]
+            }
+        )
+
+    def get(self, element_id: int) -> TechMenuElement | None:
+        """Return the menu element with the id, if present."""
+        return self.elements.get(element_id)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the menu as a JSON serializable dict."""
+        return {"elements": [asdict(element) for element in self.elements.values()]}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> TechMenu:
+        """Rebuild a menu serialized by as_dict."""
+        return cls(
+            elements={
+                element["id"]: TechMenuElement(**element)
+                for element in data["elements"]
+            }
+        )
@@ -2,19 +2,18 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
 
 from custom_components.tech.tech_update_coordinator import TechUpdateCoordinator
 
 from homeassistant.components.select import SelectEntity
 
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import (HomeAssistant, callback)
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import DOMAIN
+from .entity import TechEntity
+from .models import TechMenu, TechMenuElement
 from .tech import Tech
 
 _LOGGER = logging.getLogger(__name__)
@@ -46,7 +45,7 @@ async def async_setup_entry(
         _LOGGER.error("Failed to set up Tech climate: %s", ex)
         return False
 
-class TechHub(CoordinatorEntity, SelectEntity):    
+class TechHub(TechEntity, SelectEntity):    
     _attr_options: list[str] = list(DEFAULT_PRESETS.values())
     _attr_current_option: str | None = None
 
@@ -74,23 +73,29 @@ class TechHub(CoordinatorEntity, SelectEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""        
+        if not self._has_coordinator_changes():
+            return
+
         _LOGGER.debug("Coordinator update for hub %s", self._attr_name)
         self.update_properties(self.coordinator.get_menu())
+        self._reconcile_optimistic()
+        if self._attr_current_option == CHANGE_PRESET:
+            self._attr_options = [CHANGE_PRESET]
         self.async_write_ha_state()
 
-    def update_properties(self, device_menu_config: dict[str, Any] | None) -> None:
+    def update_properties(self, device_menu_config: TechMenu | None) -> None:
         heating_mode = self.get_heating_mode_from_menu_config(device_menu_config) if device_menu_config else None
         _LOGGER.debug("Updating heating mode for hub %s: %s", self._attr_name, heating_mode)
 
         if heating_mode is not None:            
-            if heating_mode["duringChange"] == "t":
+            if heating_mode.during_change:
                 _LOGGER.debug("Preset mode change in progress for %s", self._attr_name)
                 self._attr_options = [CHANGE_PRESET]
                 self._attr_current_option = CHANGE_PRESET
                 _LOGGER.debug("Current preset mode for %s: %s", self._attr_name, self._attr_current_option)
             else:
                 self._attr_options = list(DEFAULT_PRESETS.values())
-                heating_mode_id = heating_mode["params"]["value"]
+                heating_mode_id = heating_mode.value
                 self._attr_current_option = self.map_heating_mode_id_to_name(heating_mode_id)
                 _LOGGER.debug("Current preset mode for %s: %s", self._attr_name, self._attr_current_option)
         else:
@@ -103,17 +108,24 @@ class TechHub(CoordinatorEntity, SelectEntity):
                 return            
             
             preset_mode_id = list(DEFAULT_PRESETS.values()).index(option)
-            await self._api.set_module_menu(
-                self._udid,
-                "mu",
-                1000,
-                preset_mode_id
-            )
-
+            previous_options = self._attr_options
             self._attr_options = [CHANGE_PRESET]
-            self._attr_current_option = CHANGE_PRESET
-
-            await self.coordinator.async_request_refresh()
+            # Cloud reports the change in progress and then the new option.
+            previous = self._async_apply_optimistic("_attr_current_option", CHANGE_PRESET, option)
+
+            try:
+                await self.coordinator.async_set_menu(
+                    "mu",
+                    1000,
+                    preset_mode_id
+                )
+            except Exception:
+                self._attr_options = previous_options
+                self._async_rollback_optimistic("_attr_current_option", previous)
+                raise
+
+            if not self.coordinator.optimistic:
+                self._attr_current_option = CHANGE_PRESET
         except Exception as ex:
             _LOGGER.error(
                 "Failed to set preset mode for %s to %s: %s",
@@ -122,15 +134,10 @@ class TechHub(CoordinatorEntity, SelectEntity):
                 ex
             )
 
-    def get_heating_mode_from_menu_config(self, menu_config: dict[str, Any]) -> dict[str, Any] | None:
+    def get_heating_mode_from_menu_config(self, menu_config: TechMenu) -> TechMenuElement | None:
         """Get current preset mode from menu config."""
-        element = None
         heating_mode_menu_id = 1000
-        for e in menu_config["elements"]:
-            if e["id"] == heating_mode_menu_id:
-                element = e
-                break   
-        return element
+        return menu_config.get(heating_mode_menu_id)
     
     def map_heating_mode_id_to_name(self, heating_mode_id) -> str:
         """Map heating mode id to preset mode name."""
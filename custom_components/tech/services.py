@@ -0,0 +1,173 @@
+"""Services of the Tech Controllers integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_TEMPERATURE
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+
+from .const import (
+    ACCOUNT_HUBS,
+    DOMAIN,
+    MAX_CONCURRENT_GROUP_WRITES,
+    SERVICE_SET_ZONES,
+    SERVICE_START_RECORDING,
+    SERVICE_STOP_RECORDING,
+)
+from .tech import Tech, TechError
+from .tech_cassette import TechCassetteRecorder
+from .tech_update_coordinator import TechUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_ZONES = "zones"
+ATTR_ON = "on"
+ATTR_FILENAME = "filename"
+
+def _unique_entity_ids(zones: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Reject zone lists naming an entity more than once, results are keyed by entity id."""
+    entity_ids = [zone[ATTR_ENTITY_ID] for zone in zones]
+    if len(entity_ids) != len(set(entity_ids)):
+        raise vol.Invalid("Each entity_id may appear only once")
+    return zones
+
+
+SET_ZONES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ZONES): vol.All(cv.ensure_list, [vol.All(
+        vol.Schema({
+            vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+            vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+            vol.Optional(ATTR_ON): cv.boolean,
+        }),
+        cv.has_at_least_one_key(ATTR_TEMPERATURE, ATTR_ON),
+    )], _unique_entity_ids),
+})
+
+START_RECORDING_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_FILENAME, default="tech_cassette"): cv.slug,
+})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def async_set_zones(call: ServiceCall) -> ServiceResponse:
+        return await _async_set_zones(hass, call.data[ATTR_ZONES])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_ZONES,
+        async_set_zones,
+        schema=SET_ZONES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_start_recording(call: ServiceCall) -> None:
+        await _async_start_recording(hass, call.data[ATTR_FILENAME])
+
+    async def async_stop_recording(call: ServiceCall) -> None:
+        for hub in hass.data[DOMAIN].get(ACCOUNT_HUBS, {}).values():
+            await async_stop_recording_api(hass, hub.api)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_RECORDING,
+        async_start_recording,
+        schema=START_RECORDING_SCHEMA,
+    )
+    hass.services.async_register(DOMAIN, SERVICE_STOP_RECORDING, async_stop_recording)
+
+
+async def _async_start_recording(hass: HomeAssistant, filename: str) -> None:
+    """Record the API traffic of every account to <filename>_<n>.jsonl.gz in the config dir."""
+    for index, hub in enumerate(hass.data[DOMAIN].get(ACCOUNT_HUBS, {}).values()):
+        await async_stop_recording_api(hass, hub.api)
+        path = hass.config.path(f"{filename}_{index}.jsonl.gz")
+        hub.api.recorder = await hass.async_add_executor_job(TechCassetteRecorder, path)
+        _LOGGER.info("Recording Tech API traffic to %s", path)
+
+
+async def async_stop_recording_api(hass: HomeAssistant, api: Tech) -> None:
+    """Stop recording the API traffic of a client and close the cassette."""
+    if (recorder := api.recorder) is not None:
+        api.recorder = None
+        await hass.async_add_executor_job(recorder.close)
+
+
+async def _async_set_zones(hass: HomeAssistant, targets: list[dict[str, Any]]) -> ServiceResponse:
+    """Write many zones at once and refresh every affected module once.
+
+    Writes go straight to the Tech clients, at most
+    MAX_CONCURRENT_GROUP_WRITES at a time. The write queues of the targeted
+    modules are flushed first, so writes still queued there, e.g. from a
+    slider drag, are not sent after and override these. Returns the outcome
+    of every target by entity id.
+    """
+    registry = er.async_get(hass)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_GROUP_WRITES)
+    affected: dict[str, TechUpdateCoordinator] = {}
+    results: dict[str, dict[str, Any]] = {}
+    zones = {
+        target[ATTR_ENTITY_ID]: _resolve_zone(hass, registry, target[ATTR_ENTITY_ID])
+        for target in targets
+    }
+    targeted = {resolved[0].udid: resolved[0] for resolved in zones.values() if resolved is not None}
+    await asyncio.gather(*(coordinator.write_queue.flush() for coordinator in targeted.values()))
+
+    async def async_write(target: dict[str, Any]) -> None:
+        entity_id = target[ATTR_ENTITY_ID]
+        resolved = zones[entity_id]
+        if resolved is None:
+            results[entity_id] = {"success": False, "error": "Not a Tech zone"}
+            return
+
+        coordinator, zone_id = resolved
+        zone = coordinator.get_zones().get(zone_id) if coordinator.data else None
+        if zone is None:
+            results[entity_id] = {"success": False, "error": "Zone not available"}
+            return
+
+        api = coordinator.tech_api
+        async with semaphore:
+            try:
+                if ATTR_ON in target:
+                    await api.set_zone(coordinator.udid, zone_id, target[ATTR_ON])
+                if ATTR_TEMPERATURE in target:
+                    await api.set_const_temp(coordinator.udid, zone.mode_id, zone_id, target[ATTR_TEMPERATURE])
+            except TechError as err:
+                _LOGGER.warning("Failed to set zone %s: %s", entity_id, err)
+                results[entity_id] = {"success": False, "error": str(err)}
+            except Exception as err:  # pylint: disable=broad-except
+                # One failing target must not cancel the others or skip the refresh.
+                _LOGGER.exception("Unexpected error setting zone %s", entity_id)
+                results[entity_id] = {"success": False, "error": str(err) or type(err).__name__}
+            else:
+                results[entity_id] = {"success": True}
+            finally:
+                affected[coordinator.udid] = coordinator
+
+    await asyncio.gather(*(async_write(target) for target in targets))
+    await asyncio.gather(
+        *(coordinator.async_refresh_after_writes() for coordinator in affected.values())
+    )
+    return {ATTR_ZONES: results}
+
+
+def _resolve_zone(
+    hass: HomeAssistant, registry: er.EntityRegistry, entity_id: str
+) -> tuple[TechUpdateCoordinator, int] | None:
+    """Return the coordinator and zone id of a Tech climate entity."""
+    entry = registry.async_get(entity_id)
+    if entry is None or entry.platform != DOMAIN or entry.domain != "climate":
+        return None
+    entry_data = hass.data[DOMAIN].get(entry.config_entry_id)
+    if entry_data is None:
+        return None
+    # Climate unique ids are "<udid>_<zone id>".
+    _, _, zone_id = entry.unique_id.rpartition("_")
+    return entry_data["coordinator"], int(zone_id)
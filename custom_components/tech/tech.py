@@ -6,24 +6,581 @@ import aiohttp
 import json
 import time
 import asyncio
-from aiocache import Cache, cached
+import random
+import contextlib
+import contextvars
+import heapq
+import itertools
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
+# orjson ships with Home Assistant and decodes responses several times faster.
+json_loads = orjson.loads if orjson is not None else json.loads
+
+REDACTED_KEYS = {"token", "password", "authorization", "email", "phoneNumber"}
+
+def redact(data, keys = REDACTED_KEYS):
+    """Returns copy of data with values of keys replaced."""
+    if isinstance(data, dict):
+        return {
+            key: "**REDACTED**" if isinstance(key, str) and (key in keys or key.lower() in keys) else redact(value, keys)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [redact(item, keys) for item in data]
+    return data
+
+class TechResponseCache:
+    """Size bounded LRU cache of Tech API GET responses.
+
+    Entries are keyed by request path. They are dropped when they expire,
+    when the cache is full or when a write to the same module endpoint
+    invalidates them. Expired entries are purged at most once per ttl when
+    a response is stored, so responses that are not read again do not stay
+    in memory.
+    """
+
+    def __init__(self, ttl = 30, max_entries = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._purged_at = time.monotonic()
+
+    def get(self, request_path, max_age = None):
+        """Returns cached response or None if missing or older than max_age (defaults to ttl)."""
+        key = request_path.lower()
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, data = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl and (max_age is None or age < max_age):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            if age >= self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+        self.misses += 1
+        return None
+
+    def set(self, request_path, data, generation = None):
+        """Stores response unless the cache was invalidated since generation was read."""
+        if self.ttl <= 0 or (generation is not None and generation != self.generation):
+            return
+        now = time.monotonic()
+        if now - self._purged_at >= self.ttl:
+            self._purge_expired(now)
+        key = request_path.lower()
+        self._entries[key] = (now, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _purge_expired(self, now):
+        self._purged_at = now
+        for expired in [key for key, (stored_at, _) in self._entries.items() if now - stored_at >= self.ttl]:
+            del self._entries[expired]
+            self.expirations += 1
+
+    def invalidate(self, *request_paths):
+        """Drops cached responses of the given request paths, including selected parts of them."""
+        self.generation += 1
+        for request_path in request_paths:
+            key = request_path.lower()
+            for stale in [entry for entry in self._entries if entry == key or entry.startswith(key + "#")]:
+                del self._entries[stale]
+                self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expirations": self.expirations
+        }
+
+def invalidated_paths(request_path):
+    """Returns GET request paths made stale by a write to request_path.
+
+    A zone write changes the module data, a menu write changes the menu of
+    its type and, as e.g. heating mode drives zone setpoints, the module data.
+    """
+    parts = request_path.split("/")
+    if len(parts) < 5 or parts[0] != "users" or parts[2] != "modules":
+        return []
+    module_path = "/".join(parts[:4])
+    if parts[4] == "menu" and len(parts) > 5:
+        return [module_path, module_path + "/menu/" + parts[5]]
+    return [module_path]
+
+def registered_zones(data):
+    """Returns zones of a module data response indexed by zone ID, without unregistered ones."""
+    return {
+        zone["zone"]["id"]: zone
+        for zone in data["zones"]["elements"]
+        if zone["zone"]["zoneState"] != "zoneUnregistered"
+    }
+
+def endpoint_name(method, request_path):
+    """Returns request path with user, module and menu element ids replaced by placeholders."""
+    parts = request_path.split("/")
+    if len(parts) > 1 and parts[0] == "users":
+        parts[1] = "{user_id}"
+    if len(parts) > 3 and parts[2] == "modules":
+        parts[3] = "{udid}"
+    if len(parts) > 7 and parts[6] == "ido":
+        parts[7] = "{id}"
+    return method + " " + "/".join(parts)
+
+class TechMetrics:
+    """Per-endpoint request counters and latency histograms."""
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def record(self, endpoint, status, duration, size = 0, decode_time = 0.0, retries = 0):
+        """Records a completed request.
+
+        Parameters:
+        endpoint (string): Endpoint name, see endpoint_name.
+        status (int or string): HTTP status code or the error type of a failed request.
+        duration (float): Seconds from sending the request to the decoded response.
+        size (int): Response body size in bytes.
+        decode_time (float): Seconds spent decoding JSON.
+        retries (int): Number of retries the request needed.
+        """
+        stats = self._stats(endpoint)
+        stats["requests"] += 1
+        stats["retries"] += retries
+        stats["status"][status] = stats["status"].get(status, 0) + 1
+        stats["latency_total"] += duration
+        stats["latency_max"] = max(stats["latency_max"], duration)
+        bucket = next((index for index, bound in enumerate(self.LATENCY_BUCKETS) if duration <= bound), len(self.LATENCY_BUCKETS))
+        stats["latency_buckets"][bucket] += 1
+        stats["bytes"] += size
+        stats["decode_time"] += decode_time
+
+    def record_retry(self, endpoint):
+        """Records that a failed request of endpoint is retried."""
+        self._stats(endpoint)["retries"] += 1
+
+    def _stats(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                "requests": 0,
+                "retries": 0,
+                "status": {},
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "latency_buckets": [0] * (len(self.LATENCY_BUCKETS) + 1),
+                "bytes": 0,
+                "decode_time": 0.0
+            }
+        return stats
+
+    def as_dict(self):
+        """Returns a JSON serializable copy of the metrics with mean latency per endpoint."""
+        result = {}
+        for endpoint, stats in self.endpoints.items():
+            if not stats["requests"]:
+                continue
+            result[endpoint] = dict(
+                stats,
+                status={str(status): count for status, count in stats["status"].items()},
+                latency_buckets=dict(zip([str(bound) for bound in self.LATENCY_BUCKETS] + ["inf"], stats["latency_buckets"])),
+                latency_mean=stats["latency_total"] / stats["requests"]
+            )
+        return result
+
+class TechCircuitBreaker:
+    """Stops requests to the Tech API while it keeps failing.
+
+    After failure_threshold consecutive transient failures the circuit opens
+    and requests fail fast for reset_timeout seconds. Then a single probe
+    request is let through: success closes the circuit, failure opens it
+    again for twice as long, up to max_reset_timeout. A failure carrying a
+    Retry-After delay blocks requests at least for that delay.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold = 5, reset_timeout = 30, max_reset_timeout = 600):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._timeout = reset_timeout
+        self._open_until = 0.0
+        self._blocked_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self.OPEN
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if now < self._open_until or self._probing:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_in(self):
+        """Returns seconds until the next request is let through."""
+        if self.state != self.OPEN:
+            return 0
+        return max(self._open_until, self._blocked_until) - time.monotonic()
+
+    def before_request(self):
+        """Raises TechCircuitOpenError unless a request may be sent now."""
+        state = self.state
+        if state == self.OPEN:
+            raise TechCircuitOpenError(self.retry_in())
+        if state == self.HALF_OPEN:
+            self._probing = True
+
+    def record_success(self):
+        if self.failures >= self.failure_threshold:
+            _LOGGER.info("Tech API recovered, closing circuit")
+        self.failures = 0
+        self._timeout = self.reset_timeout
+        self._probing = False
+
+    def record_failure(self, retry_after = None):
+        if retry_after:
+            self._blocked_until = time.monotonic() + retry_after
+        self.failures += 1
+        if self._probing:
+            self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold or self._probing:
+                self.opened += 1
+                _LOGGER.warning("Tech API unavailable, pausing requests for %s s", self._timeout)
+            self._open_until = time.monotonic() + self._timeout
+        self._probing = False
+
+    def release(self):
+        """Ends a probe that completed without a verdict, e.g. was cancelled."""
+        self._probing = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "retry_in": self.retry_in()
+        }
+
+def retry_after(value, max_delay):
+    """Returns seconds to wait from a Retry-After header value, None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0), max_delay)
+
+PRIORITY_WRITE = 0
+PRIORITY_CONFIRM = 1
+PRIORITY_POLL = 2
+PRIORITY_NAMES = ("write", "confirm", "poll")
+
+_request_priority = contextvars.ContextVar("tech_request_priority", default=None)
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Sends the Tech requests made within the block with the given priority.
+
+    Without it GET requests are sent as polls and other methods as writes.
+    """
+    reset_token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(reset_token)
+
+_request_timeout = contextvars.ContextVar("tech_request_timeout", default=None)
+
+@contextlib.contextmanager
+def request_timeout(seconds):
+    """Limits every attempt of the Tech requests made within the block to seconds.
+
+    The timeout starts once the scheduler granted the request its slot, so
+    time spent queued behind other requests or sleeping before a retry does
+    not count. It replaces the request_timeout of the client.
+    """
+    reset_token = _request_timeout.set(aiohttp.ClientTimeout(total=seconds))
+    try:
+        yield
+    finally:
+        _request_timeout.reset(reset_token)
+
+class TechRequestScheduler:
+    """Grants request slots by priority within a concurrency limit and a rate budget.
+
+    Waiting requests are served writes first, then confirmation reads,
+    then background polls, in arrival order within a priority. The rate
+    budget is a token bucket refilled with requests_per_second tokens up
+    to burst, None disables it.
+    """
+
+    def __init__(self, max_concurrency = 4, requests_per_second = None, burst = None):
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst or max(requests_per_second or 1, 1)
+        self.active = 0
+        self.granted = [0] * len(PRIORITY_NAMES)
+        self.max_wait = [0.0] * len(PRIORITY_NAMES)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+
+    async def acquire(self, priority = PRIORITY_POLL):
+        """Waits for a request slot, which must be given back with release()."""
+        if not self._waiters and self._take():
+            self.granted[priority] += 1
+            return
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot granted just as the waiter was cancelled.
+                self.release()
+            raise
+        self.granted[priority] += 1
+        self.max_wait[priority] = max(self.max_wait[priority], time.monotonic() - started)
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _take(self):
+        """Takes a slot and a rate token if both are available."""
+        if self.active >= self.max_concurrency:
+            return False
+        if self.requests_per_second:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.requests_per_second)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+        self.active += 1
+        return True
+
+    def _dispatch(self):
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take():
+                break
+            heapq.heappop(self._waiters)
+            waiter.set_result(None)
+        if self._waiters and self.active < self.max_concurrency and self._wakeup is None:
+            # Out of rate tokens, wake up when the next one is available.
+            delay = (1 - self._tokens) / self.requests_per_second
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": sum(1 for _, _, waiter in self._waiters if not waiter.done()),
+            "granted": dict(zip(PRIORITY_NAMES, self.granted)),
+            "max_wait": dict(zip(PRIORITY_NAMES, self.max_wait))
+        }
+
+class TechWriteQueue:
+    """Debounced, last-write-wins queue of Tech API writes.
+
+    Writes are keyed by their target, e.g. the set temperature of one zone.
+    Writes queued within delay seconds of each other form a batch in which
+    only the last write per key is sent. The batch is flushed at the latest
+    max_delay seconds after its first write and on_flush is awaited once
+    after all of its writes completed.
+    """
+
+    def __init__(self, delay = 1.0, max_delay = 5.0, on_flush = None):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.queued_writes = 0
+        self.sent_writes = 0
+        self._pending = {}
+        self._batch_started = None
+        self._timer = None
+        self._flush_task = None
+
+    @property
+    def pending(self):
+        """True if writes are waiting to be sent."""
+        return bool(self._pending) or (self._flush_task is not None and not self._flush_task.done())
+
+    def enqueue(self, key, write):
+        """Queues write, replacing any pending write with the same key.
+
+        Parameters:
+        key (hashable): Write target, writes with equal keys supersede each other.
+        write (callable): Coroutine function sending the write.
+
+        Returns:
+        Future resolved with the result of the write actually sent for key.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.get(key)
+        waiters = pending[1] if pending else []
+        waiters.append(future)
+        self._pending[key] = (write, waiters)
+        self.queued_writes += 1
+
+        now = loop.time()
+        if self._batch_started is None:
+            self._batch_started = now
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = min(self.delay, self._batch_started + self.max_delay - now)
+        self._timer = loop.call_later(max(delay, 0), self._start_flush)
+        return future
+
+    def _start_flush(self):
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self._send_pending())
+
+    async def flush(self):
+        """Sends all pending writes now and awaits on_flush once.
+
+        A batch already being sent is awaited first, so all writes queued
+        before the call completed when it returns.
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.shield(self._flush_task)
+        await self._send_pending()
+
+    async def _send_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending
+        self._pending = {}
+        self._batch_started = None
+        if not batch:
+            return
+
+        _LOGGER.debug("Flushing %s queued Tech writes", len(batch))
+        results = await asyncio.gather(
+            *(write() for write, _ in batch.values()), return_exceptions=True
+        )
+        self.sent_writes += len(batch)
+        for (_, waiters), result in zip(batch.values(), results):
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if isinstance(result, BaseException):
+                    waiter.set_exception(result)
+                else:
+                    waiter.set_result(result)
+
+        if self.on_flush is not None:
+            try:
+                await self.on_flush()
+            except Exception as err:
+                _LOGGER.warning("Flush callback after Tech writes failed: %s", err)
+
 class Tech:
     """Main class to perform Tech API requests"""
 
     TECH_API_URL = "https://emodul.eu/api/v1/"
 
-    def __init__(self, session: aiohttp.ClientSession, user_id = None, token = None, base_url = TECH_API_URL):
+    def __init__(
+        self,
+        session: aiohttp.ClientSession = None,
+        user_id = None,
+        token = None,
+        base_url = TECH_API_URL,
+        cache_ttl = 30,
+        cache_max_entries = 64,
+        payload_log_sample = 0,
+        payload_log_limit = 2000,
+        retries = 3,
+        retry_backoff = 0.5,
+        max_retry_delay = 10,
+        username = None,
+        password = None,
+        connection_limit = 4,
+        keepalive_timeout = 60,
+        dns_cache_ttl = 300,
+        request_timeout = 20,
+        selective_decoding = True,
+        max_concurrent_requests = 4,
+        requests_per_second = 5,
+        request_burst = 10
+    ):
         _LOGGER.debug("Init Tech")
         self.headers = {
             'Accept': 'application/json',
             'Accept-Encoding': 'gzip'
         }
-        self.base_url = base_url
+        # Request paths are appended to base_url, so it must end with a slash.
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        # Without a session the client owns one with a connector tuned for
+        # the single API host, created on first request and closed by close().
         self.session = session
+        self._owns_session = session is None
+        self.connection_limit = connection_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = aiohttp.ClientTimeout(total=request_timeout) if request_timeout else None
+        self.connections_created = 0
+        self.connections_reused = 0
+        # Module data is reduced to the registered zones right after decoding,
+        # so tiles and the rest of the document are neither cached nor kept.
+        self.selective_decoding = selective_decoding
+        # Shared by all modules of the account, so user writes overtake polls.
+        self.scheduler = TechRequestScheduler(max_concurrent_requests, requests_per_second, request_burst)
+        # Optional TechCassetteRecorder capturing all requests to a file.
+        self.recorder = None
         if user_id and token:
             self.user_id = user_id
             self.token = token
@@ -32,30 +589,303 @@ class Tech:
         else:
             self.authenticated = False
         self.zones = {}
-    
-    async def get(self, request_path):
+        self.cache = TechResponseCache(cache_ttl, cache_max_entries)
+        self.coalesced_requests = 0
+        self._in_flight = {}
+        self.metrics = TechMetrics()
+        self._request_hooks = []
+        # Response payloads are logged only if sampling is enabled and debug
+        # logging is on: every n-th response, truncated to limit characters.
+        self.payload_log_sample = payload_log_sample
+        self.payload_log_limit = payload_log_limit
+        self._payload_log_count = 0
+        # Idempotent GETs are retried with jittered exponential backoff.
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self.circuit_breaker = TechCircuitBreaker()
+        # Credentials to re-acquire an expired token, shared by concurrent requests.
+        self._credentials = (username, password) if username and password else None
+        self._renew_task = None
+        self._token_listeners = []
+        self.token_renewals = 0
+
+    def _create_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+    async def _on_connection_created(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.connections_reused += 1
+
+    async def close(self):
+        """Closes the session if owned by the client, a later request opens a new one."""
+        if self._owns_session and self.session is not None:
+            session, self.session = self.session, None
+            await session.close()
+
+    def add_token_listener(self, listener):
+        """Registers listener(user_id, token) called after the token was renewed.
+
+        Returns a function removing the listener.
+        """
+        self._token_listeners.append(listener)
+        return lambda: self._token_listeners.remove(listener)
+
+    async def renew_token(self, expired_token = None):
+        """Re-acquires the token with the stored credentials.
+
+        Concurrent callers share one authentication request. Returns at once
+        if the token already changed since expired_token was used.
+        """
+        if self._credentials is None:
+            raise TechAuthError(401, "No credentials to renew token")
+        if expired_token is not None and expired_token != self.token:
+            return
+        if self._renew_task is None:
+            self._renew_task = asyncio.ensure_future(self._renew_token())
+            self._renew_task.add_done_callback(self._renew_done)
+        await asyncio.shield(self._renew_task)
+
+    async def _renew_token(self):
+        _LOGGER.info("Tech API token rejected, renewing")
+        with request_priority(PRIORITY_WRITE):
+            authenticated = await self.authenticate(*self._credentials)
+        if not authenticated:
+            raise TechAuthError(401, "Token renewal failed")
+        self.token_renewals += 1
+        for listener in self._token_listeners:
+            try:
+                listener(self.user_id, self.token)
+            except Exception:
+                _LOGGER.exception("Tech token listener failed")
+
+    def _renew_done(self, task):
+        self._renew_task = None
+        if not task.cancelled():
+            task.exception()
+
+    def _log_payload(self, method, request_path, data):
+        if not self.payload_log_sample or not _LOGGER.isEnabledFor(logging.DEBUG):
+            return
+        self._payload_log_count += 1
+        if self._payload_log_count % self.payload_log_sample:
+            return
+        text = json.dumps(redact(data))
+        if len(text) > self.payload_log_limit:
+            text = "%s... (%s characters)" % (text[:self.payload_log_limit], len(text))
+        _LOGGER.debug("%s %s response: %s", method, request_path, text)
+
+    def add_request_hook(self, hook):
+        """Registers hook(phase, info) called with phase "start" and "end" around each request.
+
+        The info dict holds method, endpoint and url, at the end also status,
+        duration, size, decode_time and error. Returns a function removing the hook.
+        """
+        self._request_hooks.append(hook)
+        return lambda: self._request_hooks.remove(hook)
+
+    def _run_request_hooks(self, phase, info):
+        for hook in self._request_hooks:
+            try:
+                hook(phase, info)
+            except Exception:
+                _LOGGER.exception("Tech request hook failed")
+
+    def stats(self):
+        """Returns request metrics, cache and coalescing counters."""
+        return {
+            "requests": self.metrics.as_dict(),
+            "cache": self.cache.stats(),
+            "coalesced_requests": self.coalesced_requests,
+            "circuit_breaker": self.circuit_breaker.stats(),
+            "token_renewals": self.token_renewals,
+            "scheduler": self.scheduler.stats(),
+            "connections": {
+                "owned": self._owns_session,
+                "created": self.connections_created,
+                "reused": self.connections_reused
+            }
+        }
+
+    async def _request(self, method, request_path, post_data = None, select = None):
+        """Sends request, records its metrics and returns the decoded JSON response.
+
+        If given, select(data) is applied to the decoded response and returned instead.
+
+        Raises a TechError subclass classifying the failure.
+        """
+        priority = _request_priority.get()
+        if priority is None:
+            priority = PRIORITY_POLL if method == "GET" else PRIORITY_WRITE
+        await self.scheduler.acquire(priority)
+        try:
+            return await self._request_slot(method, request_path, post_data, select)
+        finally:
+            self.scheduler.release()
+
+    async def _request_slot(self, method, request_path, post_data, select):
+        self.circuit_breaker.before_request()
         url = self.base_url + request_path
-        _LOGGER.debug("Sending GET request: " + url)
-        async with self.session.get(url, headers=self.headers) as response:
-            if response.status != 200:
-                _LOGGER.warning("Invalid response from Tech API: %s", response.status)
-                raise TechError(response.status, await response.text())
-
-            data = await response.json()
-            _LOGGER.debug(data)
+        info = {"method": method, "endpoint": endpoint_name(method, request_path), "url": url}
+        self._run_request_hooks("start", info)
+        started = time.monotonic()
+        status = None
+        size = 0
+        decode_time = 0.0
+        try:
+            if self.session is None:
+                self.session = self._create_session()
+            timeout = _request_timeout.get() or self.request_timeout
+            timeout = {"timeout": timeout} if timeout else {}
+            if self.recorder is not None:
+                request = self.recorder.request(self.session, method, url, data=post_data, headers=self.headers, **timeout)
+            else:
+                request = self.session.request(method, url, data=post_data, headers=self.headers, **timeout)
+            async with request as response:
+                status = response.status
+                if response.status != 200:
+                    _LOGGER.warning("Invalid response from Tech API: %s", response.status)
+                    raise error_from_response(
+                        response.status,
+                        await response.text(),
+                        retry_after(response.headers.get("Retry-After"), self.max_retry_delay * 6)
+                    )
+
+                body = await response.read()
+                size = len(body)
+                decode_started = time.monotonic()
+                data = json_loads(body)
+                if select is not None:
+                    data = select(data)
+                decode_time = time.monotonic() - decode_started
+                self.circuit_breaker.record_success()
+                return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            status = type(err).__name__
+            info["error"] = err
+            self.circuit_breaker.record_failure()
+            raise TechConnectionError(None, str(err) or status) from err
+        except TechError as err:
+            info["error"] = err
+            if err.retryable:
+                self.circuit_breaker.record_failure(err.retry_after)
+            else:
+                self.circuit_breaker.record_success()
+            raise
+        except BaseException as err:
+            info["error"] = err
+            self.circuit_breaker.release()
+            if status is None:
+                status = type(err).__name__
+            raise
+        finally:
+            info.update(status=status, duration=time.monotonic() - started, size=size, decode_time=decode_time)
+            self.metrics.record(info["endpoint"], status, info["duration"], size, decode_time)
+            self._run_request_hooks("end", info)
+
+    async def _send(self, method, request_path, post_data = None, select = None):
+        """Sends request, renewing a rejected token once and replaying the request.
+
+        GET requests are retried on transient failures, other methods are not.
+        """
+        for attempt in range(2):
+            token = self.token if self.authenticated else None
+            try:
+                if method == "GET":
+                    return await self._request_with_retry(method, request_path, select)
+                return await self._request(method, request_path, post_data, select)
+            except TechAuthError:
+                if attempt or token is None or self._credentials is None or request_path == "authentication":
+                    raise
+                await self.renew_token(token)
+                _LOGGER.debug("Replaying %s %s with renewed token", method, request_path)
+
+    async def _request_with_retry(self, method, request_path, select = None):
+        """Sends an idempotent request, retrying transient failures.
+
+        Each attempt gets its own timeout, so a Retry-After delay of up to
+        max_retry_delay is slept outside of it and the retry can complete.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._request(method, request_path, select=select)
+            except TechError as err:
+                if not err.retryable or attempt >= self.retries:
+                    raise
+                if err.retry_after is not None:
+                    if err.retry_after > self.max_retry_delay:
+                        raise
+                    # Margin so the circuit breaker's Retry-After block has ended.
+                    delay = err.retry_after + 0.1
+                else:
+                    delay = random.uniform(0, min(self.retry_backoff * 2 ** attempt, self.max_retry_delay))
+                attempt += 1
+                self.metrics.record_retry(endpoint_name(method, request_path))
+                _LOGGER.debug("Retrying %s %s in %.2f s after: %s", method, request_path, delay, err)
+                await asyncio.sleep(delay)
+
+    async def get(self, request_path, max_age = None, select = None):
+        """Returns response of GET request, from cache if not older than max_age.
+
+        Parameters:
+        request_path (string): Path relative to base_url.
+        max_age (float): Maximum age of cached response in seconds, None for cache ttl, 0 to bypass cache.
+        select (function): Reduces the decoded response, the result is cached apart from the full response.
+        """
+        cache_key = request_path if select is None else request_path + "#" + select.__name__
+        data = self.cache.get(cache_key, max_age)
+        if data is not None:
+            _LOGGER.debug("Cache hit for GET request: %s", cache_key)
             return data
+
+        generation = self.cache.generation
+        url = self.base_url + cache_key
+        in_flight = self._in_flight.get(url)
+        if in_flight is not None and in_flight[0] == generation:
+            # Identical request already on the wire, share its response.
+            self.coalesced_requests += 1
+            _LOGGER.debug("Joining in-flight GET request: %s", url)
+            return await asyncio.shield(in_flight[1])
+
+        task = asyncio.ensure_future(self._fetch(request_path, cache_key, generation, select))
+        self._in_flight[url] = (generation, task)
+        task.add_done_callback(lambda done: self._fetch_done(url, done))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, request_path, cache_key, generation, select):
+        _LOGGER.debug("Sending GET request: %s", self.base_url + request_path)
+        data = await self._send("GET", request_path, select=select)
+        self._log_payload("GET", request_path, data)
+        self.cache.set(cache_key, data, generation)
+        return data
+
+    def _fetch_done(self, url, task):
+        in_flight = self._in_flight.get(url)
+        if in_flight is not None and in_flight[1] is task:
+            del self._in_flight[url]
+        if not task.cancelled():
+            # Retrieve the exception so an unawaited failure is not reported.
+            task.exception()
     
     async def post(self, request_path, post_data):
         url = self.base_url + request_path
-        _LOGGER.debug("Sending POST request: " + url)
-        async with self.session.post(url, data=post_data, headers=self.headers) as response:
-            if response.status != 200:
-                _LOGGER.warning("Invalid response from Tech API: %s", response.status)
-                raise TechError(response.status, await response.text())
-
-            data = await response.json()
-            _LOGGER.debug(data)
-            return data
+        _LOGGER.debug("Sending POST request: %s", url)
+        data = await self._send("POST", request_path, post_data)
+        self._log_payload("POST", request_path, data)
+        self.cache.invalidate(*invalidated_paths(request_path))
+        return data
     
     async def authenticate(self, username, password):
         path = "authentication"
@@ -63,6 +893,7 @@ class Tech:
         result = await self.post(path, post_data)
         self.authenticated = result["authenticated"]
         if self.authenticated:
+            self._credentials = (username, password)
             self.user_id = str(result["user_id"])
             self.token = result["token"]
             self.headers = {
@@ -70,6 +901,7 @@ class Tech:
                 'Accept-Encoding': 'gzip',
                 'Authorization': 'Bearer ' + self.token
             }
+            self.cache.clear()
         return result["authenticated"]
 
     async def list_modules(self):
@@ -80,32 +912,33 @@ class Tech:
             raise TechError(401, "Unauthorized")
         return result
     
-    async def get_module_data(self, module_udid):
-        _LOGGER.debug("Getting module data..." + module_udid + ", " + self.user_id)
+    async def get_module_data(self, module_udid, max_age = None):
+        _LOGGER.debug("Getting module data: %s", module_udid)
         if self.authenticated:
             path = "users/" + self.user_id + "/modules/" + module_udid
-            result = await self.get(path)
+            result = await self.get(path, max_age)
         else:
             raise TechError(401, "Unauthorized")
         return result
     
-    @cached(ttl=10, cache=Cache.MEMORY)
-    async def get_module_zones(self, module_udid):
+    async def get_module_zones(self, module_udid, max_age = None):
         """Returns Tech module zones either from cache or it will
         update all the cached values for Tech module assuming
-        no update has occurred for at least the [update_interval].
+        no write or update has occurred for at least the cache ttl.
 
         Parameters:
-        inst (Tech): The instance of the Tech API.
         module_udid (string): The Tech module udid.
+        max_age (float): Maximum age of cached module data in seconds.
 
         Returns:
         Dictionary of zones indexed by zone ID.
         """
-        result = await self.get_module_data(module_udid)
-        zones = result["zones"]["elements"]
-        zones = list(filter(lambda e: e['zone']['zoneState'] != "zoneUnregistered", zones))
-        return { zone["zone"]["id"]: zone for zone in zones } 
+        if not self.selective_decoding:
+            return registered_zones(await self.get_module_data(module_udid, max_age))
+        if self.authenticated:
+            path = "users/" + self.user_id + "/modules/" + module_udid
+            return await self.get(path, max_age, select=registered_zones)
+        raise TechError(401, "Unauthorized")
     
     async def get_zone(self, module_udid, zone_id):
         """Returns zone from Tech API cache.
@@ -134,7 +967,7 @@ class Tech:
         _LOGGER.debug("Setting zone constant temperature...")
         if self.authenticated:
             path = f"users/{self.user_id}/modules/{module_udid}/zones"
-            _LOGGER.debug("Path: " + path)
+            _LOGGER.debug("Path: %s", path)
             data = {
                 "mode" : {
                     "id" : zone_mode_id,
@@ -145,7 +978,7 @@ class Tech:
                     "scheduleIndex" : 0
                 }
             }
-            _LOGGER.debug(data)
+            _LOGGER.debug("Request data: %s", data)
             result = await self.post(path, json.dumps(data))
         else:
             raise TechError(401, "Unauthorized")
@@ -171,19 +1004,19 @@ class Tech:
                     "zoneState" : "zoneOn" if on else "zoneOff"
                 }
             }
-            _LOGGER.debug(data)
+            _LOGGER.debug("Request data: %s", data)
             result = await self.post(path, json.dumps(data))
         else:
             raise TechError(401, "Unauthorized")
         return result
 
-    @cached(ttl=10, cache=Cache.MEMORY)
-    async def get_module_menu(self, module_udid, menu_type):
+    async def get_module_menu(self, module_udid, menu_type, max_age = None):
         """ Gets module menu options
        
         Parameters:
         module_udid (string): The tech module udid
         menu_type (string): Menu type, one of the following: "MU", "MI", "MS", "MP"
+        max_age (float): Maximum age of cached menu in seconds
 
         Return:
         JSON object with results
@@ -192,7 +1025,7 @@ class Tech:
         _LOGGER.debug("Getting module menu: %s", menu_type)
         if self.authenticated:
             path = f"users/{self.user_id}/modules/{module_udid}/menu/{menu_type}"
-            result = await self.get(path)       
+            result = await self.get(path, max_age)
         else:
             raise TechError(401, "Unauthorized")
         return result
@@ -213,7 +1046,7 @@ class Tech:
             data = {
                 "value": menu_value
             }
-            _LOGGER.debug(data)
+            _LOGGER.debug("Request data: %s", data)
             result = await self.post(path, json.dumps(data))
         else:
             raise TechError(401, "Unauthorized")
@@ -225,6 +1058,52 @@ class TechError(Exception):
         status_code - error code returned by Tech API
         status - more detailed description
     """
+    retryable = False
+    retry_after = None
+
     def __init__(self, status_code, status):
         self.status_code = status_code
         self.status = status
+
+    def __str__(self):
+        return f"{self.status_code}: {self.status}"
+
+class TechAuthError(TechError):
+    """Raised when the token was rejected (401, 403)."""
+
+class TechRateLimitError(TechError):
+    """Raised when requests are rate limited (429)."""
+    retryable = True
+
+    def __init__(self, status_code, status, retry_after = None):
+        super().__init__(status_code, status)
+        self.retry_after = retry_after
+
+class TechServerError(TechError):
+    """Raised on Tech API server errors (5xx)."""
+    retryable = True
+
+    def __init__(self, status_code, status, retry_after = None):
+        super().__init__(status_code, status)
+        self.retry_after = retry_after
+
+class TechConnectionError(TechError):
+    """Raised when the Tech API could not be reached or timed out."""
+    retryable = True
+
+class TechCircuitOpenError(TechError):
+    """Raised without a request while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(None, f"Tech API unavailable, next attempt in {retry_in:.0f} s")
+        self.retry_in = retry_in
+
+def error_from_response(status_code, text, retry_after = None):
+    """Returns the TechError subclass matching an error response."""
+    if status_code in (401, 403):
+        return TechAuthError(status_code, text)
+    if status_code == 429:
+        return TechRateLimitError(status_code, text, retry_after)
+    if status_code >= 500:
+        return TechServerError(status_code, text, retry_after)
+    return TechError(status_code, text)
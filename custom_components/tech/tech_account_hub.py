@@ -0,0 +1,181 @@
+"""Account-scoped poller shared by all Tech modules of one eModul account."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+
+from custom_components.tech.tech import Tech
+from custom_components.tech.tech_poll import TechPollPhasePlanner, TechPollScheduler
+from custom_components.tech.tech_update_coordinator import TechUpdateCoordinator
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_UPDATE_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def account_key(user_id: str, token: str) -> str:
+    """Return the key identifying an eModul account session."""
+    return f"{user_id}:{token}"
+
+
+class TechAccountHub:
+    """Owns one Tech API client and one polling schedule for an account.
+
+    Every module of the account registers its coordinator here. A single
+    timer refreshes all of them in one cycle, so the number of timers and
+    clients scales with accounts rather than with modules. The delay until
+    the next cycle adapts to pending changes and to how often data changes.
+    Within a cycle module refreshes are staggered by TechPollPhasePlanner,
+    except for modules awaiting confirmation of a change.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: Tech,
+        update_interval: timedelta = timedelta(seconds=DEFAULT_UPDATE_INTERVAL),
+        min_update_interval: timedelta = timedelta(seconds=DEFAULT_MIN_UPDATE_INTERVAL),
+        max_update_interval: timedelta = timedelta(seconds=DEFAULT_MAX_UPDATE_INTERVAL),
+    ) -> None:
+        """Initialize the account hub."""
+        self.hass = hass
+        self.api = api
+        self.scheduler = TechPollScheduler(
+            update_interval.total_seconds(),
+            min_update_interval.total_seconds(),
+            max_update_interval.total_seconds(),
+        )
+        self.phase_planner = TechPollPhasePlanner()
+        self.phases: dict[str, float] = {}
+        self._coordinators: dict[str, TechUpdateCoordinator] = {}
+        self._unsub_listeners: dict[str, CALLBACK_TYPE] = {}
+        self._unsub_refresh: CALLBACK_TYPE | None = None
+        self._next_poll: float | None = None
+        self._polling = False
+
+    @property
+    def key(self) -> str:
+        """Return the account key, which follows token renewals."""
+        return account_key(self.api.user_id, self.api.token)
+
+    @property
+    def coordinators(self) -> dict[str, TechUpdateCoordinator]:
+        """Return the registered module coordinators indexed by udid."""
+        return self._coordinators
+
+    @callback
+    def async_add_coordinator(self, coordinator: TechUpdateCoordinator) -> None:
+        """Register a module coordinator and start polling if needed."""
+        self._coordinators[coordinator.udid] = coordinator
+        self._unsub_listeners[coordinator.udid] = coordinator.async_add_listener(
+            lambda: self._async_coordinator_updated(coordinator)
+        )
+        if self._unsub_refresh is None:
+            self._async_schedule_poll(self.scheduler.interval)
+
+    @callback
+    def async_remove_coordinator(self, udid: str) -> bool:
+        """Unregister a module coordinator.
+
+        Returns True when no coordinators are left and the hub can be dropped.
+        """
+        self._coordinators.pop(udid, None)
+        if (unsub := self._unsub_listeners.pop(udid, None)) is not None:
+            unsub()
+        if self._coordinators:
+            return False
+
+        self._async_cancel_poll()
+        return True
+
+    @callback
+    def _async_coordinator_updated(self, coordinator: TechUpdateCoordinator) -> None:
+        """Bring the next poll forward when a module awaits confirmation."""
+        if self._polling or not coordinator.is_change_pending():
+            return
+
+        delay = self.scheduler.min_interval
+        if self._next_poll is None or self._next_poll > self.hass.loop.time() + delay:
+            _LOGGER.debug("Change pending for module %s, polling in %ss", coordinator.udid, delay)
+            self._async_schedule_poll(delay)
+
+    @callback
+    def _async_schedule_poll(self, delay: float) -> None:
+        self._async_cancel_poll()
+        self._next_poll = self.hass.loop.time() + delay
+        self._unsub_refresh = async_call_later(self.hass, delay, self._async_poll)
+
+    @callback
+    def _async_cancel_poll(self) -> None:
+        if self._unsub_refresh is not None:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        self._next_poll = None
+
+    def rate_profile(self) -> dict[str, float]:
+        """Return the outbound request rate profile of the current phases."""
+        requests = {
+            udid: coordinator.requests_per_update()
+            for udid, coordinator in self._coordinators.items()
+        }
+        return self.phase_planner.rate_profile(self.phases, self.scheduler.interval, requests)
+
+    async def _async_refresh_at(self, coordinator: TechUpdateCoordinator, offset: float) -> None:
+        """Refresh a module offset seconds into the cycle unless it was removed."""
+        if offset > 0 and not coordinator.is_change_pending():
+            await asyncio.sleep(offset)
+            if self._coordinators.get(coordinator.udid) is not coordinator:
+                return
+        await coordinator.async_refresh()
+
+    async def _async_poll(self, _now=None) -> None:
+        """Refresh every registered module in a single cycle.
+
+        While the API circuit breaker is open no module is polled. When it
+        lets a probe through, one module is refreshed first and the others
+        only if the probe succeeded.
+        """
+        self._unsub_refresh = None
+        breaker = self.api.circuit_breaker
+        if breaker.state == breaker.OPEN:
+            delay = max(breaker.retry_in(), self.scheduler.min_interval)
+            _LOGGER.debug("Tech API circuit open, next poll in %ss", delay)
+            self._async_schedule_poll(delay)
+            return
+
+        started = self.hass.loop.time()
+        self._polling = True
+        try:
+            coordinators = list(self._coordinators.values())
+            self.phases = self.phase_planner.phases(list(self._coordinators), self.scheduler.interval)
+            _LOGGER.debug("Polling %s Tech modules", len(coordinators))
+            remaining = coordinators
+            if breaker.state == breaker.HALF_OPEN and coordinators:
+                await coordinators[0].async_refresh()
+                remaining = coordinators[1:] if breaker.state == breaker.CLOSED else []
+            await asyncio.gather(
+                *(self._async_refresh_at(c, self.phases[c.udid]) for c in remaining)
+            )
+        finally:
+            self._polling = False
+
+        if not self._coordinators:
+            return
+
+        pending = any(c.is_change_pending() for c in coordinators)
+        changed = any(c.last_update_changed for c in coordinators)
+        # Intervals count from the cycle start, the stagger does not stretch them.
+        delay = self.scheduler.next_interval(pending, changed)
+        delay = max(delay - (self.hass.loop.time() - started), 0)
+        if breaker.state == breaker.OPEN:
+            delay = max(delay, breaker.retry_in())
+        _LOGGER.debug("Next poll in %ss (pending: %s, changed: %s)", delay, pending, changed)
+        self._async_schedule_poll(delay)
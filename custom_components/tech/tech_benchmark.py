@@ -0,0 +1,296 @@
+"""
+Benchmark of the polling and write paths against the local API simulator.
+
+Drives Tech, TechAccountHub, TechUpdateCoordinator, TechThermostat and
+TechHub for every combination of module and zone counts and reports
+requests per cycle, module update latency percentiles, CPU time per
+cycle, entity state writes per cycle and peak memory as JSON. The
+simulator runs in a child process, so CPU time and memory are those of
+the client alone. Rate budget, write delay and poll spread default to
+the values the integration ships with. With --cassette the traffic is
+served from a recording made with TechCassetteRecorder instead.
+
+Usage: python -m custom_components.tech.tech_benchmark --modules 1,5,20 --zones 1,8,32
+       python -m custom_components.tech.tech_benchmark --cassette tech_cassette_0.jsonl.gz --speed 60
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.tech.climate import TechThermostat
+from custom_components.tech.const import DEFAULT_WRITE_DELAY
+from custom_components.tech.select import TechHub
+from custom_components.tech.tech import Tech
+from custom_components.tech.tech_account_hub import TechAccountHub
+from custom_components.tech.tech_cassette import TechReplaySession
+from custom_components.tech.tech_poll import TechPollPhasePlanner
+from custom_components.tech.tech_simulator import API_PREFIX
+from custom_components.tech.tech_update_coordinator import TechUpdateCoordinator
+
+# Rate budget of the Tech client as shipped, in requests per second.
+DEFAULT_REQUESTS_PER_SECOND = 5
+
+def percentile(values, share):
+    """Returns the value below which the given share of sorted values falls."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(share * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+class SimulatorProcess:
+    """Runs the API simulator in a child process on a free local port."""
+
+    def __init__(self, **options):
+        self.options = options
+        self.process = None
+
+    async def start(self):
+        """Starts the simulator and returns its base url once it accepts connections."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        args = [sys.executable, "-m", "custom_components.tech.tech_simulator", "--port", str(port)]
+        for name, value in self.options.items():
+            args += ["--" + name.replace("_", "-"), str(value)]
+        self.process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                if self.process.returncode is not None or time.monotonic() > deadline:
+                    raise RuntimeError("API simulator did not start")
+                await asyncio.sleep(0.1)
+            else:
+                writer.close()
+                await writer.wait_closed()
+                return f"http://127.0.0.1:{port}{API_PREFIX}"
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+
+class RequestCounter:
+    """Counts the requests a Tech client sends, used as its request hook."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self.count += 1
+
+class UpdateTimer:
+    """Records the duration of every update of the wrapped coordinators."""
+
+    def __init__(self):
+        self.durations = []
+
+    def wrap(self, coordinator):
+        update_data = coordinator._async_update_data
+
+        async def timed():
+            started = time.perf_counter()
+            try:
+                return await update_data()
+            finally:
+                self.durations.append(time.perf_counter() - started)
+
+        coordinator._async_update_data = timed
+
+class StateWriteCounter:
+    """Counts async_write_ha_state calls of the wrapped entities."""
+
+    def __init__(self):
+        self.count = 0
+
+    def wrap(self, entity):
+        write_ha_state = entity.async_write_ha_state
+
+        def counted():
+            self.count += 1
+            write_ha_state()
+
+        entity.async_write_ha_state = counted
+
+async def run_scenario(hass, modules, zones, cycles, writes, latency, volatility, write_delay, requests_per_second, poll_spread, cassette = None, speed = None):
+    simulator = None
+    if cassette:
+        session = TechReplaySession(cassette, speed)
+        api = Tech(session, "replay", "replay", requests_per_second=requests_per_second)
+    else:
+        simulator = SimulatorProcess(modules=modules, zones=zones, latency=latency, volatility=volatility, change_duration=0.1, seed=modules * 1000 + zones)
+        base_url = await simulator.start()
+        session = aiohttp.ClientSession()
+        api = Tech(session, base_url=base_url, requests_per_second=requests_per_second)
+    requests = RequestCounter()
+    api.add_request_hook(requests)
+    try:
+        if simulator is not None and not await api.authenticate("user", "password"):
+            raise RuntimeError("API simulator rejected the credentials")
+        hub = TechAccountHub(hass, api)
+        hub.phase_planner.spread = poll_spread
+        counter = StateWriteCounter()
+        updates = UpdateTimer()
+        thermostats = []
+        module_infos = await api.list_modules()
+
+        for info in module_infos:
+            coordinator = TechUpdateCoordinator(hass, None, api, info["udid"], write_delay=write_delay)
+            await coordinator._async_update_data()
+            updates.wrap(coordinator)
+            hub.async_add_coordinator(coordinator)
+            entities = [TechHub(info, coordinator, api)]
+            entities += [TechThermostat(zone, coordinator, api) for zone in coordinator.get_zones().values()]
+            for entity in entities:
+                entity.hass = hass
+                entity.entity_id = f"{'select' if isinstance(entity, TechHub) else 'climate'}.bench_{entity.unique_id}"
+                coordinator.async_add_listener(entity._handle_coordinator_update, entity.coordinator_context)
+                counter.wrap(entity)
+            thermostats += [entity for entity in entities if isinstance(entity, TechThermostat)]
+        hub._async_cancel_poll()
+
+        cycle_durations = []
+        cpu_times = []
+        requests_before = requests.count
+        writes_before = counter.count
+        tracemalloc.start()
+        for _ in range(cycles):
+            # Cycles run back to back, real ones are an update interval
+            # apart and no longer find the previous responses cached.
+            api.cache.clear()
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            await hub._async_poll()
+            hub._async_cancel_poll()
+            cpu_times.append(time.process_time() - cpu_started)
+            cycle_durations.append(time.perf_counter() - started)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        poll_requests = requests.count - requests_before
+        poll_state_writes = counter.count - writes_before
+        latencies = list(updates.durations)
+        # Taken before the write burst makes changes pending.
+        rate_profile = hub.rate_profile()
+
+        # Write path: every thermostat receives a burst of setpoint changes.
+        requests_before = requests.count
+        writes_before = counter.count
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            thermostat.async_set_temperature(temperature=20 + step / 10)
+            for step in range(writes)
+            for thermostat in thermostats
+        ))
+        write_latency = time.perf_counter() - started
+        write_requests = requests.count - requests_before
+        write_state_writes = counter.count - writes_before
+
+        for udid in list(hub.coordinators):
+            coordinator = hub.coordinators[udid]
+            # As on unload, so no confirmation refresh is scheduled after shutdown.
+            await coordinator.write_queue.flush()
+            await coordinator.async_shutdown()
+            hub.async_remove_coordinator(udid)
+        # Refreshes already started, e.g. polls brought forward by the writes, end before the session closes.
+        await hass.async_block_till_done()
+
+        return {
+            "modules": modules if modules is not None else len(module_infos),
+            "zones": zones if zones is not None else len(thermostats),
+            "cycles": cycles,
+            "requests_per_second_budget": requests_per_second,
+            "write_delay": write_delay,
+            "poll_spread": poll_spread,
+            "requests_per_cycle": poll_requests / cycles,
+            "cycle_duration": statistics.fmean(cycle_durations),
+            "update_latency_p50": percentile(latencies, 0.5),
+            "update_latency_p90": percentile(latencies, 0.9),
+            "update_latency_p99": percentile(latencies, 0.99),
+            "cpu_time_per_cycle": statistics.fmean(cpu_times),
+            "state_writes_per_cycle": poll_state_writes / cycles,
+            "peak_memory_bytes": peak_memory,
+            "write_actions": writes * len(thermostats),
+            "write_requests": write_requests,
+            "write_latency": write_latency,
+            "write_state_writes": write_state_writes,
+            "coalesced_requests": api.coalesced_requests,
+            "cache": api.cache.stats(),
+            "scheduler": api.scheduler.stats(),
+            "rate_profile": rate_profile
+        }
+    finally:
+        await session.close()
+        if simulator is not None:
+            await simulator.stop()
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        results = []
+        try:
+            if args.cassette:
+                result = await run_scenario(
+                    hass, None, None, args.cycles, args.writes, None, None,
+                    args.write_delay, args.requests_per_second or None, args.poll_spread,
+                    args.cassette, args.speed
+                )
+                results.append(result)
+                return results
+            for modules in args.modules:
+                for zones in args.zones:
+                    result = await run_scenario(
+                        hass, modules, zones, args.cycles, args.writes,
+                        args.latency, args.volatility, args.write_delay, args.requests_per_second or None, args.poll_spread
+                    )
+                    results.append(result)
+                    print(f"modules={modules} zones={zones} p50={result['update_latency_p50']:.4f}s", file=sys.stderr)
+        finally:
+            await hass.async_stop(force=True)
+        return results
+
+def int_list(value):
+    return [int(item) for item in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Tech polling and write paths")
+    parser.add_argument("--modules", type=int_list, default=[1, 5, 20])
+    parser.add_argument("--zones", type=int_list, default=[1, 8, 32])
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--writes", type=int, default=5, help="setpoint changes per zone in the write burst")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated API latency in seconds")
+    parser.add_argument("--volatility", type=float, default=0.1, help="share of zones changing per read")
+    parser.add_argument("--write-delay", type=float, default=DEFAULT_WRITE_DELAY, help="write queue debounce window in seconds")
+    parser.add_argument("--requests-per-second", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="client request budget, 0 for unlimited")
+    parser.add_argument("--poll-spread", type=float, default=TechPollPhasePlanner().spread, help="share of the poll interval module refreshes are staggered over")
+    parser.add_argument("--cassette", help="replay this recording instead of running the simulator")
+    parser.add_argument("--speed", type=float, help="replay speed factor, as fast as possible by default")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Entities are not added through an entity platform, silence that warning.
+    logging.getLogger("homeassistant").setLevel(logging.ERROR)
+    results = asyncio.run(run(args))
+    report = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report)
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Record and replay of Tech API traffic.
+
+TechCassetteRecorder captures the requests of a Tech client with their
+timing, sizes and redacted payloads into a gzipped JSON lines file.
+TechReplaySession serves such a recording to a Tech client in place of an
+aiohttp session, at the original pace, accelerated or as fast as possible.
+
+Usage:
+    api.recorder = TechCassetteRecorder("tech.jsonl.gz")
+    ...
+    api.recorder.close()
+
+    api = Tech(TechReplaySession("tech.jsonl.gz", speed=10), "1", "token")
+"""
+import asyncio
+import atexit
+import gzip
+import json
+import logging
+import queue
+import re
+import threading
+import time
+
+try:
+    from .tech import REDACTED_KEYS, redact
+except ImportError:
+    from tech import REDACTED_KEYS, redact
+
+_LOGGER = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+# Cassettes are meant to be shared, so account identity is redacted as well.
+CASSETTE_REDACTED_KEYS = REDACTED_KEYS | {"username", "user_id"}
+
+_USER_PATH = re.compile(r"users/[^/]+")
+
+def cassette_path(url):
+    """Returns url relative to the API root with the user id replaced by a placeholder."""
+    _, separator, path = url.partition("/api/v1/")
+    return _USER_PATH.sub("users/{user_id}", path if separator else url)
+
+def _decode(body):
+    try:
+        return redact(json.loads(body), CASSETTE_REDACTED_KEYS)
+    except ValueError:
+        return body.decode(errors="replace")
+
+class CassetteResponse:
+    """Fully read response, as returned by recorder and replay requests."""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def read(self):
+        return self._body
+
+    async def text(self):
+        return self._body.decode(errors="replace")
+
+class _CassetteRequest:
+    """Async context manager around a coroutine returning a CassetteResponse."""
+
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+
+    async def __aenter__(self):
+        return await self._coroutine
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class TechCassetteRecorder:
+    """Appends every request of the Tech client it is assigned to to a cassette file.
+
+    Authorization headers are not recorded, payload values of
+    CASSETTE_REDACTED_KEYS are replaced and user ids are dropped from paths.
+    Decoding, compression and file writes run in a writer thread, so
+    recording does not block the event loop. Opening and close() block.
+    A recorder not closed by its owner is closed at interpreter exit, so the
+    queued records and the gzip trailer are still written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._started = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._queue = queue.SimpleQueue()
+        self._queue.put({"version": CASSETTE_VERSION, "started": time.time()})
+        self._writer = threading.Thread(target=self._write_records, name="TechCassetteRecorder", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _write_records(self):
+        while (record := self._queue.get()) is not None:
+            if "body" in record:
+                request = record["request"]
+                record["request"] = _decode(request.encode() if isinstance(request, str) else request) if request else None
+                record["body"] = _decode(record["body"])
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.close()
+
+    def request(self, session, method, url, data = None, **kwargs):
+        """Sends the request with session and records it, used like session.request."""
+        return _CassetteRequest(self._request(session, method, url, data, kwargs))
+
+    async def _request(self, session, method, url, data, kwargs):
+        started = time.monotonic()
+        async with session.request(method, url, data=data, **kwargs) as response:
+            body = await response.read()
+            headers = {"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else {}
+            status = response.status
+        if self._writer is not None:
+            self._queue.put({
+                "t": round(started - self._started, 3),
+                "method": method,
+                "path": cassette_path(url),
+                "request": data,
+                "status": status,
+                "headers": headers,
+                "duration": round(time.monotonic() - started, 4),
+                "size": len(body),
+                "body": body
+            })
+            self.records += 1
+        return CassetteResponse(status, headers, body)
+
+    def close(self):
+        """Writes the queued records and closes the file."""
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            atexit.unregister(self.close)
+            self._queue.put(None)
+            writer.join()
+            _LOGGER.info("Recorded %s Tech API requests to %s", self.records, self.path)
+
+class TechReplaySession:
+    """Stand-in for the aiohttp session of a Tech client serving a recording.
+
+    Requests are matched by method and path. Recordings of the same request
+    are served in order, the last one repeatedly once the others are used.
+    With speed set, a response is not served before its recorded time since
+    the replay started divided by speed and takes its recorded duration
+    divided by speed. Without speed responses are served at once.
+    """
+
+    def __init__(self, path, speed = None):
+        self.speed = speed
+        self.closed = False
+        self.request_count = 0
+        self.missed = 0
+        self._responses = {}
+        self._started = None
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            self.header = json.loads(next(cassette))
+            for line in cassette:
+                record = json.loads(line)
+                self._responses.setdefault((record["method"], record["path"]), []).append(record)
+
+    def request(self, method, url, data = None, **kwargs):
+        return _CassetteRequest(self._replay(method, url))
+
+    async def _replay(self, method, url):
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        self.request_count += 1
+        recorded = self._responses.get((method, cassette_path(url)))
+        if not recorded:
+            self.missed += 1
+            return CassetteResponse(404, {}, b"Not recorded")
+
+        record = recorded.pop(0) if len(recorded) > 1 else recorded[0]
+        if self.speed:
+            delay = self._started + record["t"] / self.speed - now
+            await asyncio.sleep(max(delay, 0) + record["duration"] / self.speed)
+        body = record["body"]
+        body = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        return CassetteResponse(record["status"], record["headers"], body)
+
+    async def close(self):
+        self.closed = True
@@ -0,0 +1,119 @@
+"""
+Poll cadence of an eModul account: adaptive intervals and module phases.
+
+Pure scheduling logic without Home Assistant dependencies, driven by
+TechAccountHub.
+"""
+from __future__ import annotations
+
+import math
+import zlib
+
+try:
+    from .const import (
+        DEFAULT_MAX_UPDATE_INTERVAL,
+        DEFAULT_MIN_UPDATE_INTERVAL,
+        DEFAULT_UPDATE_INTERVAL,
+    )
+except ImportError:
+    from const import (
+        DEFAULT_MAX_UPDATE_INTERVAL,
+        DEFAULT_MIN_UPDATE_INTERVAL,
+        DEFAULT_UPDATE_INTERVAL,
+    )
+
+
+class TechPollScheduler:
+    """Adaptive interval between polls of an account.
+
+    While a change is pending the interval starts at min_interval and backs
+    off towards the base interval. Changed data resets it to the base
+    interval, unchanged data relaxes it step by step up to max_interval.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_UPDATE_INTERVAL,
+        min_interval: float = DEFAULT_MIN_UPDATE_INTERVAL,
+        max_interval: float = DEFAULT_MAX_UPDATE_INTERVAL,
+        backoff: float = 2.0,
+        relax: float = 1.5,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.relax = relax
+        self.interval = interval
+        self._pending_interval: float | None = None
+
+    def next_interval(self, pending: bool, changed: bool) -> float:
+        """Return the seconds until the next poll given the last cycle."""
+        if pending:
+            if self._pending_interval is None:
+                self._pending_interval = self.min_interval
+            else:
+                self._pending_interval = min(
+                    self._pending_interval * self.backoff, self.base_interval
+                )
+            self.interval = self._pending_interval
+        else:
+            self._pending_interval = None
+            if changed:
+                self.interval = self.base_interval
+            else:
+                self.interval = min(
+                    max(self.interval, self.base_interval) * self.relax,
+                    self.max_interval,
+                )
+        return self.interval
+
+
+class TechPollPhasePlanner:
+    """Spreads the module refreshes of a poll cycle over part of the interval.
+
+    Modules get evenly spaced slots within spread times the interval, in an
+    order and with a jitter within their slot both derived from the udid.
+    Phases are deterministic, so a module keeps its phase across restarts,
+    while different modules and accounts do not poll in lockstep.
+    """
+
+    def __init__(self, spread: float = 0.5, jitter: float = 0.5) -> None:
+        """Initialize the planner."""
+        self.spread = spread
+        self.jitter = jitter
+
+    @staticmethod
+    def udid_fraction(udid: str) -> float:
+        """Return a stable pseudo-random number in [0, 1) for the udid."""
+        return zlib.crc32(udid.encode()) / 2**32
+
+    def phases(self, udids: list[str], interval: float) -> dict[str, float]:
+        """Return the offset in seconds from the cycle start for every udid."""
+        if not udids:
+            return {}
+        slot = interval * self.spread / len(udids)
+        ordered = sorted(udids, key=self.udid_fraction)
+        return {
+            udid: (index + self.jitter * self.udid_fraction(udid)) * slot
+            for index, udid in enumerate(ordered)
+        }
+
+    @staticmethod
+    def rate_profile(
+        phases: dict[str, float], interval: float, requests: dict[str, int]
+    ) -> dict[str, float]:
+        """Return the mean and peak outbound requests per second of a cycle.
+
+        Requests holds the number of requests of an update by udid.
+        """
+        buckets = [0] * max(math.ceil(interval), 1)
+        for udid, offset in phases.items():
+            buckets[min(int(offset), len(buckets) - 1)] += requests.get(udid, 0)
+        return {
+            "interval": interval,
+            "requests": sum(buckets),
+            "mean_requests_per_second": sum(buckets) / len(buckets),
+            "peak_requests_per_second": max(buckets),
+        }
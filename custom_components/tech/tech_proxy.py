@@ -0,0 +1,176 @@
+"""
+Local caching proxy of the emodul.eu API for several consumers of one account.
+
+Serves the API paths used by the Tech client and answers them through one
+Tech client per account, so GET responses are cached and coalesced with
+the client's rules and writes are forwarded and invalidate the cached
+responses they make stale. Home Assistant instances, dashboards and
+scripts pointed at the proxy with Tech(base_url=...) then cause the same
+cloud traffic as a single consumer.
+
+Usage: python tech_proxy.py --port 8099 --ttl 30
+       Tech(session, base_url="http://proxy-host:8099/api/v1/")
+"""
+import argparse
+import json
+import logging
+
+from aiohttp import web
+
+try:
+    from .tech import Tech, TechAuthError, TechCircuitOpenError, TechError
+except ImportError:
+    from tech import Tech, TechAuthError, TechCircuitOpenError, TechError
+
+_LOGGER = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1/"
+
+class TechProxy:
+    """Caching eModul API proxy.
+
+    Parameters:
+    upstream_url (string): API root the requests are forwarded to.
+    cache_ttl (float): Seconds GET responses are served from cache.
+    """
+
+    def __init__(self, upstream_url = Tech.TECH_API_URL, cache_ttl = 30):
+        self.upstream_url = upstream_url
+        self.cache_ttl = cache_ttl
+        # Clients of accounts logged in through the proxy, by username.
+        self._accounts = {}
+        # Clients by every token issued to or presented by consumers.
+        self._clients = {}
+        self.app = web.Application()
+        self.app.router.add_post(API_PREFIX + "authentication", self._authenticate)
+        self.app.router.add_route("*", API_PREFIX + "{path:.+}", self._forward)
+        self.app.on_cleanup.append(self._close_clients)
+        self._runner = None
+
+    async def start(self, host = "127.0.0.1", port = 0):
+        """Starts serving, returns the base url to pass to Tech."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _close_clients(self, app):
+        for client in set(self._clients.values()):
+            await client.close()
+        self._clients.clear()
+        self._accounts.clear()
+
+    def _new_client(self, user_id = None, token = None):
+        client = Tech(None, user_id, token, base_url=self.upstream_url, cache_ttl=self.cache_ttl)
+        # Consumers keep using the token they got, so renewed tokens are added, not swapped.
+        client.add_token_listener(lambda _user_id, renewed: self._clients.setdefault(renewed, client))
+        return client
+
+    async def _authenticate(self, request):
+        """Logs in once per account, later logins get the token of the existing session."""
+        data = json.loads(await request.text())
+        username, password = data.get("username"), data.get("password")
+        account = self._accounts.get(username)
+        if account is not None and account[0] == password:
+            client = account[1]
+        else:
+            client = self._new_client()
+            try:
+                authenticated = await client.authenticate(username, password)
+            except TechError as err:
+                await client.close()
+                return self._error_response(err)
+            if not authenticated:
+                await client.close()
+                return web.json_response({"authenticated": False})
+            if account is not None:
+                await account[1].close()
+            self._accounts[username] = (password, client)
+            self._clients[client.token] = client
+            _LOGGER.info("Proxying Tech account %s", client.user_id)
+        return web.json_response({"authenticated": True, "user_id": int(client.user_id), "token": client.token})
+
+    def _client(self, request, path):
+        """Returns the request's token and its client, None as client if it is not allowed.
+
+        A client for a token obtained from the cloud directly is created but
+        not stored, the caller keeps it only once an upstream request succeeded.
+        """
+        authorization = request.headers.get("Authorization", "")
+        if not authorization.startswith("Bearer "):
+            return None, None
+        token = authorization[len("Bearer "):]
+        parts = path.split("/")
+        user_id = parts[1] if len(parts) > 1 and parts[0] == "users" else None
+        client = self._clients.get(token)
+        if client is None and user_id is not None:
+            client = self._new_client(user_id, token)
+        if client is None or client.user_id != user_id:
+            return token, None
+        return token, client
+
+    def _logged_in(self, client):
+        return any(account[1] is client for account in self._accounts.values())
+
+    async def _forward(self, request):
+        path = request.match_info["path"]
+        token, client = self._client(request, path)
+        if client is None:
+            return web.Response(status=401, text="Unauthorized")
+        if request.method not in ("GET", "POST"):
+            return web.Response(status=405, text="Method not allowed")
+        stored = self._clients.get(token) is client
+        try:
+            if request.method == "GET":
+                data = await client.get(path)
+            else:
+                data = await client.post(path, await request.text())
+            if not stored:
+                # First successful request with a direct token, keep its client.
+                stored = self._clients.setdefault(token, client) is client
+        except TechError as err:
+            if stored and isinstance(err, TechAuthError) and not self._logged_in(client):
+                self._clients.pop(token, None)
+                stored = False
+            return self._error_response(err)
+        finally:
+            if not stored:
+                await client.close()
+        return web.json_response(data)
+
+    @staticmethod
+    def _error_response(err):
+        headers = {}
+        if isinstance(err, TechCircuitOpenError):
+            headers["Retry-After"] = str(int(err.retry_in) + 1)
+        elif err.retry_after is not None:
+            headers["Retry-After"] = str(int(err.retry_after))
+        status = err.status_code or (503 if isinstance(err, TechCircuitOpenError) else 502)
+        return web.Response(status=status, text=str(err.status), headers=headers)
+
+    def stats(self):
+        """Returns the stats of every proxied account client by user id."""
+        return {client.user_id: client.stats() for client in set(self._clients.values())}
+
+def main():
+    parser = argparse.ArgumentParser(description="Local caching proxy of the emodul.eu API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--upstream", default=Tech.TECH_API_URL, help="API root requests are forwarded to")
+    parser.add_argument("--ttl", type=float, default=30, help="seconds GET responses are served from cache")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    proxy = TechProxy(args.upstream, args.ttl)
+    print(f"Serving eModul API proxy at http://{args.host}:{args.port}{API_PREFIX}")
+    web.run_app(proxy.app, host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Local stand-in for the emodul.eu API endpoints used by the Tech client.
+
+Serves authentication, module list, module data, zones and menu endpoints
+from generated modules, with configurable latency, error rate and heating
+mode change duration. Point the client at it with Tech(base_url=...).
+
+Usage: python tech_simulator.py --modules 3 --zones 8 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1/"
+HEATING_MODE_MENU_ID = 1000
+
+class TechSimulator:
+    """Simulated eModul account with modules, zones and menus.
+
+    Parameters:
+    modules (int): Number of modules of the account.
+    zones (int or list): Zones per module, or a list with a count per module.
+    latency (float): Seconds added to every response.
+    latency_jitter (float): Random extra latency up to this many seconds.
+    error_rate (float): Share of requests answered with error_status.
+    error_status (int): HTTP status of injected errors.
+    retry_after (float): Retry-After header value sent with injected errors.
+    change_duration (float): Seconds a heating mode change stays in progress.
+    volatility (float): Share of zones whose current temperature moves per module read.
+    seed (int): Seed of the random generator for reproducible runs.
+    """
+
+    def __init__(self, modules = 1, zones = 8, latency = 0.0, latency_jitter = 0.0,
+                 error_rate = 0.0, error_status = 500, retry_after = None, change_duration = 5.0,
+                 volatility = 0.0, user_id = 1, token = "simulator-token",
+                 username = "user", password = "password", seed = None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        # Number of upcoming requests to fail regardless of error_rate.
+        self.fail_next = 0
+        self.change_duration = change_duration
+        self.volatility = volatility
+        self.user_id = user_id
+        self.token = token
+        self.username = username
+        self.password = password
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.requests = {}
+        self.modules = {}
+
+        zone_counts = zones if isinstance(zones, list) else [zones] * modules
+        for index, zone_count in enumerate(zone_counts):
+            udid = f"sim{index:04d}"
+            self.modules[udid] = self._create_module(index, udid, zone_count)
+
+        self.app = web.Application(middlewares=[self._middleware])
+        prefix = API_PREFIX + "users/{user_id}/modules"
+        self.app.router.add_post(API_PREFIX + "authentication", self._authenticate)
+        self.app.router.add_get(prefix, self._list_modules)
+        self.app.router.add_get(prefix + "/{udid}", self._module_data)
+        self.app.router.add_post(prefix + "/{udid}/zones", self._set_zone)
+        self.app.router.add_get(prefix + "/{udid}/menu/{menu_type}", self._menu)
+        self.app.router.add_post(prefix + "/{udid}/menu/{menu_type}/ido/{menu_id}", self._set_menu)
+        self._runner = None
+
+    def _create_module(self, index, udid, zone_count):
+        zones = {}
+        for zone_id in range(1, zone_count + 1):
+            zones[zone_id] = {
+                "zone": {
+                    "id": zone_id,
+                    "parentId": index,
+                    "time": None,
+                    "duringChange": "f",
+                    "index": zone_id - 1,
+                    "currentTemperature": self.random.randint(180, 230),
+                    "setTemperature": 210,
+                    "flags": {"relayState": "off", "minOneWindowOpen": False, "algorithm": "heating", "floorSensor": 0},
+                    "zoneState": "zoneOn",
+                    "signalStrength": None,
+                    "batteryLevel": None,
+                    "actuatorsOpen": 0,
+                    "humidity": self.random.randint(35, 60),
+                    "visibility": True
+                },
+                "description": {"id": zone_id, "parentId": zone_id, "name": f"Zone {zone_id}", "styleId": 0, "styleIcon": 0, "duringChange": "f"},
+                "mode": {"id": 1000 + zone_id, "parentId": zone_id, "mode": "timeLimit", "constTempTime": 60, "setTemperature": 210, "scheduleIndex": 0},
+                "schedule": {"id": 2000 + zone_id, "parentId": zone_id, "index": 0, "p0Days": ["0", "1", "2", "3", "4", "5", "6"], "p0Intervals": [], "p0SetbackTemp": 160}
+            }
+        return {
+            "info": {
+                "id": index + 1,
+                "default": index == 0,
+                "name": f"Simulated module {index + 1}",
+                "email": self.username,
+                "type": "L-8",
+                "controllerStatus": "active",
+                "moduleStatus": "active",
+                "additionalInformation": "",
+                "version": "3.0.14",
+                "udid": udid
+            },
+            "zones": zones,
+            "heating_mode": {"value": 0, "pending": None, "change_until": 0.0}
+        }
+
+    async def start(self, host = "127.0.0.1", port = 0):
+        """Starts serving, returns the base url to pass to Tech."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.request_count += 1
+        resource = request.match_info.route.resource
+        key = f"{request.method} {resource.canonical if resource else request.path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        delay = self.latency + self.random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.fail_next > 0 or (self.error_rate > 0 and self.random.random() < self.error_rate):
+            self.fail_next = max(self.fail_next - 1, 0)
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+            return web.Response(status=self.error_status, text="Simulated error", headers=headers)
+        if request.match_info.get("user_id") is not None:
+            if request.headers.get("Authorization") != "Bearer " + self.token:
+                return web.Response(status=401, text="Unauthorized")
+            if request.match_info["user_id"] != str(self.user_id):
+                return web.Response(status=403, text="Forbidden")
+            udid = request.match_info.get("udid")
+            if udid is not None and udid not in self.modules:
+                return web.Response(status=404, text="Module not found")
+        return await handler(request)
+
+    async def _authenticate(self, request):
+        data = json.loads(await request.text())
+        if data.get("username") != self.username or data.get("password") != self.password:
+            return web.json_response({"authenticated": False})
+        return web.json_response({"authenticated": True, "user_id": self.user_id, "token": self.token})
+
+    async def _list_modules(self, request):
+        return web.json_response([module["info"] for module in self.modules.values()])
+
+    async def _module_data(self, request):
+        module = self.modules[request.match_info["udid"]]
+        zones = list(module["zones"].values())
+        for zone in zones:
+            if self.volatility > 0 and self.random.random() < self.volatility:
+                zone["zone"]["currentTemperature"] += self.random.choice((-1, 1))
+        return web.json_response({
+            "zones": {"transaction_time": str(int(time.time())), "elements": zones, "globalSchedules": {}},
+            "tiles": [],
+            "userLanguage": "en"
+        })
+
+    async def _set_zone(self, request):
+        module = self.modules[request.match_info["udid"]]
+        data = json.loads(await request.text())
+        if "mode" in data:
+            zone = module["zones"][data["mode"]["parentId"]]
+            zone["mode"].update(data["mode"])
+            zone["zone"]["setTemperature"] = data["mode"]["setTemperature"]
+        elif "zone" in data:
+            zone = module["zones"][data["zone"]["id"]]
+            zone["zone"]["zoneState"] = data["zone"]["zoneState"]
+        else:
+            return web.Response(status=400, text="Bad request")
+        return web.json_response({"status": "success"})
+
+    def _heating_mode(self, module):
+        heating_mode = module["heating_mode"]
+        if heating_mode["pending"] is not None and time.monotonic() >= heating_mode["change_until"]:
+            heating_mode["value"] = heating_mode["pending"]
+            heating_mode["pending"] = None
+        return heating_mode
+
+    async def _menu(self, request):
+        module = self.modules[request.match_info["udid"]]
+        if request.match_info["menu_type"].lower() != "mu":
+            return web.json_response({"status": "success", "data": {"elements": []}})
+        heating_mode = self._heating_mode(module)
+        return web.json_response({
+            "status": "success",
+            "data": {
+                "elements": [{
+                    "id": HEATING_MODE_MENU_ID,
+                    "parentId": 0,
+                    "type": 1,
+                    "menuType": "MU",
+                    "access": True,
+                    "txtId": 0,
+                    "duringChange": "t" if heating_mode["pending"] is not None else "f",
+                    "params": {"value": heating_mode["value"], "options": [0, 1, 2, 3]}
+                }]
+            }
+        })
+
+    async def _set_menu(self, request):
+        module = self.modules[request.match_info["udid"]]
+        if int(request.match_info["menu_id"]) != HEATING_MODE_MENU_ID:
+            return web.Response(status=404, text="Menu element not found")
+        data = json.loads(await request.text())
+        heating_mode = self._heating_mode(module)
+        heating_mode["pending"] = data["value"]
+        heating_mode["change_until"] = time.monotonic() + self.change_duration
+        return web.json_response({"status": "success"})
+
+def main():
+    parser = argparse.ArgumentParser(description="Local emodul.eu API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--modules", type=int, default=1)
+    parser.add_argument("--zones", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--change-duration", type=float, default=5.0)
+    parser.add_argument("--volatility", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    simulator = TechSimulator(
+        modules=args.modules,
+        zones=args.zones,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        change_duration=args.change_duration,
+        volatility=args.volatility,
+        seed=args.seed
+    )
+    print(f"Serving simulated eModul API at http://{args.host}:{args.port}{API_PREFIX}")
+    web.run_app(simulator.app, host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
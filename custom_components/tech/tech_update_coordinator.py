@@ -1,25 +1,98 @@
 """Example integration using DataUpdateCoordinator."""
 
-from datetime import timedelta
+import asyncio
+from dataclasses import asdict
 import logging
+import time
 from typing import Any
 
-import async_timeout
-
-from custom_components.tech.tech import (Tech, TechError)
+from custom_components.tech.tech import (
+    PRIORITY_CONFIRM,
+    PRIORITY_POLL,
+    Tech,
+    TechAuthError,
+    TechError,
+    TechWriteQueue,
+    request_priority,
+    request_timeout,
+)
+from homeassistant.core import callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
 )
 
+from .const import (
+    CONFIRM_DELAY,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_WRITE_DELAY,
+    DOMAIN,
+    MENU_REFRESH_INTERVALS,
+    STALE_DATA_TIMEOUT,
+)
+from .models import TechMenu, TechZone
+
 _LOGGER = logging.getLogger(__name__)
 
+# Per-endpoint timeouts in seconds of every request attempt, not counting
+# the time it waits for a slot in the account's request scheduler.
+ZONES_TIMEOUT = 10
+MENU_TIMEOUT = 10
+
+HEATING_MODE_MENU_ID = 1000
+
+# Version 1 held the raw zones and "mu" menu responses, version 2 holds
+# the parsed zone and menu records of every polled menu type.
+SNAPSHOT_STORAGE_VERSION = 2
+# Seconds to batch snapshot writes to disk.
+SNAPSHOT_SAVE_DELAY = 60
+
+
+class TechSnapshotStore(Store):
+    """Store of the last good snapshot of a module."""
+
+    async def _async_migrate_func(self, old_major_version, old_minor_version, old_data):
+        """Migrate a snapshot of raw API responses to parsed records.
+
+        A snapshot that cannot be parsed is dropped, the module then starts
+        from its first live update.
+        """
+        if old_major_version > 1:
+            return {}
+        try:
+            menu = old_data.get("menu")
+            return {
+                "zones": [asdict(TechZone.from_api(zone)) for zone in old_data["zones"].values()],
+                "menus": {
+                    "mu": TechMenu.from_api(menu["data"]).as_dict()
+                } if menu and menu.get("status") == "success" else {},
+            }
+        except (AttributeError, KeyError, TypeError):
+            _LOGGER.warning("Dropping unreadable snapshot %s", self.key)
+            return {}
+
+
+def snapshot_store(hass, udid: str) -> Store:
+    """Return the store holding the last good snapshot of a module."""
+    return TechSnapshotStore(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.snapshot.{udid}")
+
 
 class TechUpdateCoordinator(DataUpdateCoordinator):
     """My custom coordinator."""
 
-    def __init__(self, hass, config_entry, tech_api : Tech, udid):
+    def __init__(
+        self,
+        hass,
+        config_entry,
+        tech_api : Tech,
+        udid,
+        write_delay: float = DEFAULT_WRITE_DELAY,
+        optimistic: bool = DEFAULT_OPTIMISTIC,
+    ):
         """Initialize my coordinator."""
         super().__init__(
             hass,
@@ -27,45 +100,265 @@ class TechUpdateCoordinator(DataUpdateCoordinator):
             # Name of the data. For logging purposes.
             name= f"Tech module coordinator: {udid}",
             config_entry=config_entry,
-            # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(seconds=32),
+            # Polling is driven by the account hub, which refreshes all
+            # modules of the account in a single cycle.
+            update_interval=None,
         )
         self.tech_api = tech_api
         self.udid: str = udid
+        # Entities apply written values locally instead of awaiting a refresh.
+        self.optimistic = optimistic
+        # Rapid writes are coalesced per target and followed by one refresh.
+        self.write_queue = TechWriteQueue(write_delay, on_flush=self._async_confirm_writes)
+        self._unsub_confirm = None
+        self._confirm_pending = False
+        # Updates accept cached responses younger than the fastest poll.
+        self.max_age: float = DEFAULT_MIN_UPDATE_INTERVAL / 2
+        # Whether the last update returned different data than the one before.
+        self.last_update_changed = True
+        # Listener contexts whose data changed in the last update, None for all.
+        self._changed_contexts: set[Any] | None = None
+        self._last_notified_success: bool | None = None
+        self._store = snapshot_store(hass, udid)
+        # True while data comes from the stored snapshot, not from the cloud.
+        self.restored = False
+        self._last_good_update: float | None = None
+        # Menu types polled on their own cadence and when each was last fetched.
+        self.menu_types: set[str] = {"mu"}
+        self._menu_fetched: dict[str, float] = {}
 
     def get_data(self) -> dict[str, Any]:
         """Return the latest data."""
         return self.data
     
-    def get_zones(self) -> dict[str, Any]:
-        """Return the latest zones data."""
+    def get_zones(self) -> dict[int, TechZone]:
+        """Return the latest zones indexed by zone id."""
         return self.data["zones"]
     
-    def get_menu(self) -> dict[str, Any] | None:
-        """Return the latest menu data."""
-        return self.data["menu"]
+    def get_menu(self, menu_type: str = "mu") -> TechMenu | None:
+        """Return the latest menu of the type, elements indexed by element id."""
+        return self.data["menus"].get(menu_type.lower())
+
+    def is_menu_stale(self) -> bool:
+        """Return True if menu data comes from an earlier failed update."""
+        return self.data.get("menu_stale", False)
+
+    def _due_menu_types(self) -> list[str]:
+        """Return the polled menu types to fetch in this update."""
+        if self.is_change_pending() or not self.data or self.is_menu_stale():
+            return sorted(self.menu_types)
+        now = time.monotonic()
+        return sorted(
+            menu_type
+            for menu_type in self.menu_types
+            if now - self._menu_fetched.get(menu_type, float("-inf"))
+            >= MENU_REFRESH_INTERVALS.get(menu_type, MENU_REFRESH_INTERVALS["mu"])
+        )
+
+    def requests_per_update(self) -> int:
+        """Return the number of API requests the next update sends, zones and due menus."""
+        return 1 + len(self._due_menu_types())
+
+    async def async_restore(self) -> bool:
+        """Load the last good snapshot, returns True if one was found."""
+        snapshot = await self._store.async_load()
+        if not snapshot:
+            return False
+
+        _LOGGER.debug("Restored snapshot for module %s", self.udid)
+        self.data = {
+            "zones": {zone["id"]: TechZone(**zone) for zone in snapshot["zones"]},
+            "menus": {
+                menu_type: TechMenu.from_dict(menu)
+                for menu_type, menu in snapshot["menus"].items()
+            },
+            "menu_stale": True,
+        }
+        self.restored = True
+        self._last_good_update = time.monotonic()
+        return True
+
+    def _snapshot(self) -> dict[str, Any]:
+        return {
+            "zones": [asdict(zone) for zone in self.data["zones"].values()],
+            "menus": {
+                menu_type: menu.as_dict()
+                for menu_type, menu in self.data["menus"].items()
+            },
+        }
+
+    def context_changed(self, context: Any) -> bool:
+        """Return True if the data of the listener context changed in the last update.
+
+        Zone entities use the zone id as context, the module hub uses the udid.
+        """
+        return self._changed_contexts is None or context in self._changed_contexts
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update listeners, making all of them write state when availability flips."""
+        if self.last_update_success != self._last_notified_success:
+            self._changed_contexts = None
+            self._last_notified_success = self.last_update_success
+        super().async_update_listeners()
+
+    def _diff_contexts(self, data: dict[str, Any]) -> set[Any] | None:
+        """Return contexts whose data differs from the current data."""
+        if not self.data:
+            return None
+
+        zones = self.data["zones"]
+        changed = {
+            zone_id
+            for zone_id, zone in data["zones"].items()
+            if zones.get(zone_id) != zone
+        }
+        if data["menus"] != self.data["menus"] or data["menu_stale"] != self.data["menu_stale"]:
+            changed.add(self.udid)
+        return changed
+
+    def is_change_pending(self) -> bool:
+        """Return True while a write or heating mode change awaits confirmation."""
+        if self._confirm_pending or self.write_queue.pending:
+            return True
+
+        menu = self.get_menu() if self.data else None
+        element = menu.get(HEATING_MODE_MENU_ID) if menu else None
+        return element is not None and element.during_change
+
+    async def async_set_zone_temperature(self, zone_mode_id: int, zone_id: int, temperature: float) -> Any:
+        """Queue a constant temperature write for the zone."""
+        return await self.write_queue.enqueue(
+            ("setTemperature", zone_id),
+            lambda: self.tech_api.set_const_temp(self.udid, zone_mode_id, zone_id, temperature)
+        )
+
+    async def async_set_zone_state(self, zone_id: int, on: bool) -> Any:
+        """Queue turning the zone on or off."""
+        return await self.write_queue.enqueue(
+            ("zoneState", zone_id),
+            lambda: self.tech_api.set_zone(self.udid, zone_id, on)
+        )
+
+    async def async_set_menu(self, menu_type: str, menu_id: int, menu_value: int) -> Any:
+        """Queue a module menu value write and poll the written menu type from now on."""
+        self.menu_types.add(menu_type.lower())
+        return await self.write_queue.enqueue(
+            ("menu", menu_type.lower(), menu_id),
+            lambda: self.tech_api.set_module_menu(self.udid, menu_type, menu_id, menu_value)
+        )
+
+    async def _async_confirm_writes(self) -> None:
+        """Refresh after a write batch to confirm its values.
+
+        In optimistic mode entities already show the written values, so the
+        confirmation is deferred and at most one is pending at a time.
+        """
+        self._confirm_pending = True
+        if not self.optimistic:
+            await self.async_request_refresh()
+        elif self._unsub_confirm is None:
+            self._unsub_confirm = async_call_later(self.hass, CONFIRM_DELAY, self._async_confirm_refresh)
+
+    async def _async_confirm_refresh(self, _now) -> None:
+        self._unsub_confirm = None
+        await self.async_request_refresh()
+
+    async def async_first_update(self) -> None:
+        """Fetch the first data, accepting responses still in the client cache."""
+        max_age, self.max_age = self.max_age, None
+        try:
+            await self._async_update_data()
+        finally:
+            self.max_age = max_age
+
+    async def async_refresh_after_writes(self) -> None:
+        """Refresh at once to confirm writes sent outside the write queue."""
+        self._confirm_pending = True
+        await self.async_refresh()
+
+    async def async_shutdown(self) -> None:
+        """Cancel a pending confirmation refresh."""
+        if self._unsub_confirm is not None:
+            self._unsub_confirm()
+            self._unsub_confirm = None
+        await super().async_shutdown()
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
 
-        This is the place to pre-process the data to lookup tables
-        so entities can quickly look up their data.
+        Zones and the due menus are fetched concurrently, each with its own
+        timeout. Zones are fetched on every update, each polled menu type
+        only once its refresh interval passed or while a change is pending.
+        A failed menu fetch keeps the previous menu and marks it stale,
+        only a failed zones fetch fails the whole update.
+
+        Responses are parsed once into zone and menu records indexed by
+        id, so entities look up their data without touching raw payloads.
         """
-        try:
-            # Note: asyncio.TimeoutError and aiohttp.ClientError are already
-            # handled by the data update coordinator.
-            async with async_timeout.timeout(10):
-                _LOGGER.debug("getting data for module %s", self.udid)
-                zones = await self.tech_api.get_module_zones(self.udid)
-                menu = await self.tech_api.get_module_menu(self.udid, "mu")
-
-                if menu["status"] != "success":
-                    _LOGGER.warning("Failed to get menu config for Tech module %s, response: %s", self.udid, menu)
-                    menu = None
-
-                self.data = {"zones": zones, "menu": menu["data"] if menu else None}
-                return self.data                            
-        except TechError as err:       
-            raise UpdateFailed(f"Error communicating with API: {err}")  
-        except Exception as err:
-            raise ConfigEntryAuthFailed from err
\ No newline at end of file
+        _LOGGER.debug("getting data for module %s", self.udid)
+        # Reads confirming a write go ahead of the background polls of other modules.
+        menu_types = self._due_menu_types()
+        with request_priority(PRIORITY_CONFIRM if self._confirm_pending else PRIORITY_POLL):
+            zones, *menu_results = await asyncio.gather(
+                self._async_fetch(self.tech_api.get_module_zones(self.udid, self.max_age), ZONES_TIMEOUT),
+                *(
+                    self._async_fetch(self.tech_api.get_module_menu(self.udid, menu_type, self.max_age), MENU_TIMEOUT)
+                    for menu_type in menu_types
+                ),
+                return_exceptions=True,
+            )
+
+        if isinstance(zones, TechAuthError):
+            raise ConfigEntryAuthFailed from zones
+        if isinstance(zones, TechError):
+            return self._keep_last_data(zones)
+        if isinstance(zones, Exception):
+            raise UpdateFailed(f"Unexpected error updating Tech module {self.udid}: {zones}") from zones
+        if isinstance(zones, BaseException):
+            raise zones
+
+        zones = {zone_id: TechZone.from_api(zone) for zone_id, zone in zones.items()}
+
+        menus = dict(self.data["menus"]) if self.data else {}
+        menu_stale = self.is_menu_stale() if self.data and not menu_types else False
+        now = time.monotonic()
+        for menu_type, menu in zip(menu_types, menu_results):
+            if isinstance(menu, BaseException) or menu["status"] != "success":
+                _LOGGER.warning("Failed to get %s menu config for Tech module %s, response: %s", menu_type, self.udid, menu)
+                menu_stale = True
+            else:
+                menus[menu_type] = TechMenu.from_api(menu["data"])
+                self._menu_fetched[menu_type] = now
+
+        data = {"zones": zones, "menus": menus, "menu_stale": menu_stale}
+        # Entities built from a restored snapshot all need their first live state.
+        self._changed_contexts = None if self.restored else self._diff_contexts(data)
+        self.last_update_changed = self._changed_contexts is None or bool(self._changed_contexts)
+        self._confirm_pending = False
+        self.restored = False
+        self.data = data
+        self._last_good_update = time.monotonic()
+        if self.last_update_changed:
+            self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+        return self.data
+
+    def _keep_last_data(self, err: Exception) -> dict[str, Any]:
+        """Keep entities on the last good data through a transient outage.
+
+        Raises UpdateFailed once the data is older than STALE_DATA_TIMEOUT.
+        """
+        if self.data is None or self._last_good_update is None or (
+            time.monotonic() - self._last_good_update > STALE_DATA_TIMEOUT
+        ):
+            raise UpdateFailed(f"Error communicating with API: {err}")
+
+        _LOGGER.warning("Keeping last data of Tech module %s: %s", self.udid, err)
+        self._changed_contexts = set()
+        self.last_update_changed = False
+        return self.data
+
+    async def _async_fetch(self, request, timeout: float):
+        """Await a single endpoint request with its own timeout per attempt."""
+        with request_timeout(timeout):
+            return await request
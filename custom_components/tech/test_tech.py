@@ -2,7 +2,16 @@ import unittest
 import asyncio
 import aiohttp
 import tech
+import tech_simulator
+import tech_cassette
+import tech_proxy
+import tech_poll
+import models
+import gzip
+import os
+import tempfile
 import json
+import time
 
 class TestTechMethods(unittest.TestCase):
     def setUp(self):
@@ -28,5 +37,334 @@ class TestTechMethods(unittest.TestCase):
     def tearDown(self):
         self._loop.run_until_complete(self._session.close())
 
+class TestTechSimulated(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._simulator = tech_simulator.TechSimulator(modules=2, zones=4, change_duration=0.2, seed=1)
+        base_url = await self._simulator.start()
+        self._session = aiohttp.ClientSession()
+        self._tech = tech.Tech(self._session, base_url=base_url)
+        self.assertTrue(await self._tech.authenticate("user", "password"))
+
+    async def test_list_modules(self):
+        result = await self._tech.list_modules()
+        self.assertEqual(["sim0000", "sim0001"], [module["udid"] for module in result])
+
+    async def test_base_url_without_trailing_slash(self):
+        api = tech.Tech(self._session, base_url=self._tech.base_url.rstrip("/"))
+        self.assertTrue(await api.authenticate("user", "password"))
+        self.assertEqual(2, len(await api.list_modules()))
+
+    async def test_module_zones(self):
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual([1, 2, 3, 4], list(zones))
+
+    async def test_write_invalidates_cache(self):
+        await self._tech.get_module_zones("sim0000")
+        await self._tech.set_const_temp("sim0000", 1001, 1, 22.5)
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual(225, zones[1]["zone"]["setTemperature"])
+        self.assertEqual(1, self._tech.cache.invalidations)
+
+    async def test_heating_mode_change(self):
+        await self._tech.set_module_menu("sim0000", "mu", 1000, 2)
+        menu = await self._tech.get_module_menu("sim0000", "mu")
+        self.assertEqual("t", menu["data"]["elements"][0]["duringChange"])
+        await asyncio.sleep(0.3)
+        menu = await self._tech.get_module_menu("sim0000", "mu", max_age=0)
+        self.assertEqual("f", menu["data"]["elements"][0]["duringChange"])
+        self.assertEqual(2, menu["data"]["elements"][0]["params"]["value"])
+
+    async def test_cache_purges_expired_entries(self):
+        cache = tech.TechResponseCache(ttl=0.05)
+        cache.set("users/1/modules/a", {"zones": {}})
+        cache.set("users/1/modules/b", {"zones": {}})
+        await asyncio.sleep(0.06)
+        # Expired responses go when the next one is stored, without being read again.
+        cache.set("users/1/modules/c", {"zones": {}})
+        self.assertEqual(1, cache.stats()["entries"])
+        self.assertEqual(2, cache.stats()["expirations"])
+
+    async def test_coalesce_identical_requests(self):
+        await asyncio.gather(*(self._tech.get_module_data("sim0001") for _ in range(5)))
+        self.assertEqual(4, self._tech.coalesced_requests)
+
+    async def test_write_queue_last_write_wins(self):
+        flushes = []
+        async def on_flush():
+            flushes.append(queue.sent_writes)
+        queue = tech.TechWriteQueue(delay=0.05, max_delay=1, on_flush=on_flush)
+        waiters = [
+            queue.enqueue((1, "temp"), lambda temp=temp: self._tech.set_const_temp("sim0000", 1001, 1, temp))
+            for temp in (21, 22, 23.5)
+        ]
+        waiters.append(queue.enqueue((2, "temp"), lambda: self._tech.set_const_temp("sim0000", 1001, 2, 19)))
+        self.assertTrue(queue.pending)
+        results = await asyncio.gather(*waiters)
+        # Waiters of a key share the result of the one write sent for it.
+        self.assertIs(results[0], results[2])
+        self.assertEqual((4, 2), (queue.queued_writes, queue.sent_writes))
+        self.assertEqual([2], flushes)
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual((235, 190), (zones[1]["zone"]["setTemperature"], zones[2]["zone"]["setTemperature"]))
+
+    async def test_write_queue_flush_awaits_running_batch(self):
+        sent = []
+        async def write():
+            await asyncio.sleep(0.2)
+            sent.append(1)
+        queue = tech.TechWriteQueue(delay=0.01)
+        queue.enqueue("key", write)
+        await asyncio.sleep(0.05)
+        # The timer already started sending the batch, flush waits for it.
+        self.assertTrue(queue.pending)
+        await queue.flush()
+        self.assertEqual([1], sent)
+        self.assertFalse(queue.pending)
+
+    async def test_write_queue_max_delay(self):
+        sent = []
+        async def write(value):
+            sent.append(value)
+        queue = tech.TechWriteQueue(delay=0.1, max_delay=0.2)
+        # A write every 50 ms keeps postponing the delay, max_delay still flushes the batch.
+        for value in range(8):
+            queue.enqueue("key", lambda value=value: write(value))
+            await asyncio.sleep(0.05)
+        self.assertTrue(sent)
+        self.assertLess(len(sent), 8)
+        await queue.flush()
+        while queue.pending:
+            await asyncio.sleep(0.01)
+        self.assertEqual(7, sent[-1])
+
+    async def test_request_metrics(self):
+        await self._tech.get_module_data("sim0000")
+        await self._tech.get_module_data("sim0001")
+        stats = self._tech.stats()["requests"]["GET users/{user_id}/modules/{udid}"]
+        self.assertEqual(2, stats["requests"])
+        self.assertEqual({"200": 2}, stats["status"])
+        self.assertGreater(stats["bytes"], 0)
+
+    async def test_retry_transient_errors(self):
+        self._tech.retry_backoff = 0.01
+        self._simulator.fail_next = 2
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual(4, len(zones))
+        self.assertEqual(2, self._tech.stats()["requests"]["GET users/{user_id}/modules/{udid}"]["retries"])
+
+    async def test_retry_after(self):
+        self._simulator.error_status = 429
+        self._simulator.retry_after = 0.2
+        self._simulator.fail_next = 1
+        started = asyncio.get_running_loop().time()
+        await self._tech.get_module_data("sim0000")
+        self.assertGreaterEqual(asyncio.get_running_loop().time() - started, 0.2)
+
+    async def test_retry_after_longer_than_request_timeout(self):
+        self._tech.max_retry_delay = 1
+        self._simulator.error_status = 429
+        self._simulator.retry_after = 0.8
+        self._simulator.fail_next = 1
+        started = asyncio.get_running_loop().time()
+        with tech.request_timeout(0.5):
+            await self._tech.get_module_data("sim0000")
+        self.assertGreaterEqual(asyncio.get_running_loop().time() - started, 0.8)
+
+    async def test_circuit_breaker(self):
+        self._tech.retries = 0
+        self._simulator.fail_next = 5
+        for _ in range(5):
+            with self.assertRaises(tech.TechServerError):
+                await self._tech.get_module_data("sim0000")
+        requests = self._simulator.request_count
+        with self.assertRaises(tech.TechCircuitOpenError):
+            await self._tech.get_module_data("sim0000")
+        self.assertEqual(requests, self._simulator.request_count)
+        self.assertEqual("open", self._tech.circuit_breaker.state)
+
+    async def test_renew_expired_token(self):
+        self._simulator.token = "renewed-token"
+        authentications = self._simulator.requests.get("POST /api/v1/authentication", 0)
+        results = await asyncio.gather(
+            self._tech.get_module_data("sim0000"),
+            self._tech.get_module_data("sim0001"),
+            self._tech.get_module_menu("sim0000", "mu")
+        )
+        self.assertEqual(3, len(results))
+        self.assertEqual("renewed-token", self._tech.token)
+        self.assertEqual(1, self._tech.token_renewals)
+        self.assertEqual(authentications + 1, self._simulator.requests["POST /api/v1/authentication"])
+
+    async def test_owned_session(self):
+        api = tech.Tech(base_url=self._tech.base_url, connection_limit=2)
+        try:
+            self.assertTrue(await api.authenticate("user", "password"))
+            for udid in ("sim0000", "sim0001", "sim0000"):
+                await api.get_module_data(udid, max_age=0)
+            self.assertEqual(1, api.connections_created)
+            self.assertEqual(3, api.connections_reused)
+        finally:
+            session = api.session
+            await api.close()
+        self.assertTrue(session.closed)
+        self.assertIsNone(api.session)
+
+    async def test_selective_decoding(self):
+        self._simulator.modules["sim0000"]["zones"][2]["zone"]["zoneState"] = "zoneUnregistered"
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual([1, 3, 4], list(zones))
+        self.assertEqual(1, self._tech.cache.stats()["entries"])
+        await self._tech.set_zone("sim0000", 1, False)
+        self.assertEqual(0, self._tech.cache.stats()["entries"])
+        zones = await self._tech.get_module_zones("sim0000")
+        self.assertEqual("zoneOff", zones[1]["zone"]["zoneState"])
+
+    async def test_scheduler_priorities(self):
+        scheduler = tech.TechRequestScheduler(max_concurrency=1)
+        await scheduler.acquire()
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire(priority)
+            order.append(name)
+            scheduler.release()
+
+        tasks = [
+            asyncio.ensure_future(request("poll", tech.PRIORITY_POLL)),
+            asyncio.ensure_future(request("confirm", tech.PRIORITY_CONFIRM)),
+            asyncio.ensure_future(request("write", tech.PRIORITY_WRITE))
+        ]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(["write", "confirm", "poll"], order)
+
+    async def test_scheduler_rate_budget(self):
+        scheduler = tech.TechRequestScheduler(max_concurrency=4, requests_per_second=20, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            await scheduler.acquire()
+            scheduler.release()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_request_timeout_excludes_queue_wait(self):
+        simulator = tech_simulator.TechSimulator(modules=20, zones=2, latency=0.05, seed=1)
+        base_url = await simulator.start()
+        try:
+            # Default rate budget, the last first updates wait for a slot longer than their timeout.
+            api = tech.Tech(self._session, base_url=base_url)
+            self.assertTrue(await api.authenticate("user", "password"))
+            udids = [module["udid"] for module in await api.list_modules()]
+
+            async def fetch(udid):
+                with tech.request_timeout(1):
+                    return await api.get_module_zones(udid)
+
+            results = await asyncio.gather(*(fetch(udid) for udid in udids))
+            self.assertEqual(20, len(results))
+            self.assertGreater(api.scheduler.stats()["max_wait"]["poll"], 1)
+        finally:
+            await simulator.stop()
+
+    async def test_poll_scheduler_backoff_and_relax(self):
+        scheduler = tech_poll.TechPollScheduler(interval=32, min_interval=8, max_interval=120)
+        # Pending changes poll fast, backing off towards the base interval.
+        self.assertEqual([8, 16, 32, 32], [scheduler.next_interval(True, False) for _ in range(4)])
+        self.assertEqual(32, scheduler.next_interval(False, True))
+        # Unchanged data relaxes the interval up to the maximum.
+        self.assertEqual([48, 72, 108, 120], [scheduler.next_interval(False, False) for _ in range(4)])
+        self.assertEqual(32, scheduler.next_interval(False, True))
+        self.assertEqual(8, scheduler.next_interval(True, True))
+
+    async def test_poll_phases_spread(self):
+        planner = tech_poll.TechPollPhasePlanner(spread=0.5, jitter=0.5)
+        udids = [f"module{index}" for index in range(8)]
+        phases = planner.phases(udids, 120)
+        self.assertEqual(phases, planner.phases(list(reversed(udids)), 120))
+        slot = 120 * 0.5 / len(udids)
+        for index, offset in enumerate(sorted(phases.values())):
+            self.assertGreaterEqual(offset, index * slot)
+            self.assertLess(offset, (index + 0.5) * slot)
+        self.assertEqual({}, planner.phases([], 120))
+
+    async def test_poll_rate_profile(self):
+        profile = tech_poll.TechPollPhasePlanner.rate_profile(
+            {"a": 0.2, "b": 0.7, "c": 5.0, "d": 9.5}, 10, {"a": 2, "b": 1, "c": 3}
+        )
+        self.assertEqual(
+            {"interval": 10, "requests": 6, "mean_requests_per_second": 0.6, "peak_requests_per_second": 3},
+            profile
+        )
+
+    async def test_models_from_api(self):
+        zones = await self._tech.get_module_zones("sim0000")
+        zone = models.TechZone.from_api(zones[1])
+        self.assertEqual((1, zones[1]["zone"]["setTemperature"] / 10), (zone.id, zone.target_temperature))
+        menu = models.TechMenu.from_api({"elements": [
+            {"id": 1000, "params": {"value": 2}, "duringChange": "t"},
+            {"id": 1001}
+        ]})
+        self.assertEqual(models.TechMenuElement(1000, 2, True), menu.get(1000))
+        self.assertIsNone(menu.get(1001).value)
+        self.assertEqual(menu, models.TechMenu.from_dict(json.loads(json.dumps(menu.as_dict()))))
+
+    async def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tech.jsonl.gz")
+            self._tech.recorder = tech_cassette.TechCassetteRecorder(path)
+            await self._tech.authenticate("user", "password")
+            zones = await self._tech.get_module_zones("sim0000")
+            await self._tech.set_zone("sim0000", 1, False)
+            self._tech.recorder.close()
+            with gzip.open(path, "rt") as cassette:
+                recorded = cassette.read()
+            for secret in (self._simulator.token, ':"user"', ':"password"', '"user_id":1'):
+                self.assertNotIn(secret, recorded)
+
+            session = tech_cassette.TechReplaySession(path)
+            api = tech.Tech(session, "2", "other-token")
+            self.assertEqual(zones, await api.get_module_zones("sim0000"))
+            self.assertEqual("success", (await api.set_zone("sim0000", 1, False))["status"])
+            with self.assertRaises(tech.TechError):
+                await api.get_module_zones("sim0001")
+            self.assertEqual(1, session.missed)
+
+    async def test_proxy_shares_upstream_requests(self):
+        proxy = tech_proxy.TechProxy(self._tech.base_url)
+        base_url = await proxy.start()
+        try:
+            authentications = self._simulator.requests["POST /api/v1/authentication"]
+            consumers = [tech.Tech(self._session, base_url=base_url) for _ in range(3)]
+            for consumer in consumers:
+                self.assertTrue(await consumer.authenticate("user", "password"))
+            self.assertEqual(authentications + 1, self._simulator.requests["POST /api/v1/authentication"])
+            module_requests = self._simulator.requests.get("GET /api/v1/users/{user_id}/modules/{udid}", 0)
+            for consumer in consumers:
+                await consumer.get_module_zones("sim0000", max_age=0)
+            self.assertEqual(module_requests + 1, self._simulator.requests["GET /api/v1/users/{user_id}/modules/{udid}"])
+
+            await consumers[0].set_const_temp("sim0000", 1001, 1, 23)
+            zones = await consumers[1].get_module_zones("sim0000", max_age=0)
+            self.assertEqual(230, zones[1]["zone"]["setTemperature"])
+            self.assertEqual(module_requests + 2, self._simulator.requests["GET /api/v1/users/{user_id}/modules/{udid}"])
+        finally:
+            await proxy.stop()
+
+    async def test_proxy_drops_rejected_tokens(self):
+        proxy = tech_proxy.TechProxy(self._tech.base_url)
+        base_url = await proxy.start()
+        try:
+            for token in ("bogus-1", "bogus-2", self._simulator.token):
+                headers = {"Authorization": "Bearer " + token}
+                async with self._session.get(base_url + "users/1/modules", headers=headers) as response:
+                    self.assertEqual(200 if token == self._simulator.token else 401, response.status)
+            self.assertEqual([self._simulator.token], list(proxy._clients))
+        finally:
+            await proxy.stop()
+
+    async def asyncTearDown(self):
+        await self._session.close()
+        await self._simulator.stop()
+
 if __name__ == '__main__':
     unittest.main()